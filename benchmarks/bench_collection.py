@@ -0,0 +1,83 @@
+"""
+Benchmark the main collection operations on synthetic trees of increasing size (see synthetic_tree.py).
+For each scale the number of GCMs is multiplied by the scale, so the numbers of datasets and files grow linearly.
+Times in seconds for:
+- get_datasets: an unfiltered search of the whole tree (no cache)
+- filtered: a search for the historical scenario only, used as the other table for find_missing
+- repr_html: the table shown in a notebook
+- get_files: the files of every dataset, resolving the date_created clashes
+- find_missing: datasets without a match in the filtered search
+- select: select the first variable
+- condense: condense the scenario column
+Usage: python benchmarks/bench_collection.py [--key ACS_BC] [--scales 1 2 4 8] [--gcms 4] [--years 30] ...
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_finder import get_datasets
+from synthetic_tree import PATHS_YML, DEFAULT_COUNTS, make_tree, add_count_arguments, field_values
+
+
+def run(key, yaml_path):
+    timings = {}
+
+    @contextlib.contextmanager
+    def timed(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = time.perf_counter() - start
+
+    with timed("get_datasets"):
+        datasets = get_datasets(key, yaml_path)
+    with timed("filtered"):
+        historical = get_datasets(key, yaml_path, exact_match = True, scenario = "historical")
+    with timed("repr_html"):
+        datasets._repr_html_()
+    with timed("get_files"):
+        files = datasets.get_files()
+    with timed("find_missing"):
+        datasets.find_missing(historical)
+    with timed("select"):
+        selected = datasets.select(exact_match = True, var = field_values("var", 1)[0])
+    with timed("condense"):
+        selected.condense("scenario")
+
+    return len(datasets), len(files), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--key", default = "ACS_BC", help = "entry of paths.yml to follow")
+    parser.add_argument("--yaml", default = PATHS_YML, help = "paths.yml to read the entry from")
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1, 2, 4, 8], help = "multiples of the number of GCMs")
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    header = None
+    for scale in args.scales:
+        counts = {name: getattr(args, name) for name in DEFAULT_COUNTS}
+        counts["gcms"] *= scale
+
+        root = tempfile.mkdtemp(prefix = "dataset_finder_bench_")
+        try:
+            yaml_path, file_count = make_tree(root, args.key, os.path.abspath(args.yaml), **counts)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                dataset_count, chosen_count, timings = run(args.key, yaml_path)
+        finally:
+            shutil.rmtree(root)
+
+        if header is None:
+            header = f"{'scale':>5} {'datasets':>9} {'files':>8} " + " ".join(f"{name:>12}" for name in timings)
+            print(header)
+        print(f"{scale:>5} {dataset_count:>9} {file_count:>8} " + " ".join(f"{elapsed:>12.3f}" for elapsed in timings.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark compiled format matching (compile_format) against the original extract_from_format parser,
+which re-parsed the format string for every path.
+Runs on a synthetic list of CMIP6-style file paths following the "GCM" format_file in paths.yml.
+Usage: python benchmarks/bench_format_matching.py [--count 1000000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_finder import compile_format
+
+
+FORMAT_FILE = "{var}/{grid}/{date_created}/{var}_{timescale}_{gcm}_{scenario}_{mdl_run}_{grid}_{year!start:4}0101-{year!end:4}{*}.nc"
+
+
+def legacy_extract_from_format(format_string, input_string):
+    """
+    The original per-call parser, kept here as the baseline for comparison.
+    """
+    extracted_values = {}
+    while format_string:
+        if "{" not in format_string:
+            if format_string != input_string:
+                raise ValueError("Strings are not the same format")
+            break
+
+        arg_start = format_string.find("{")
+        if format_string[:arg_start] != input_string[:arg_start]:
+            raise ValueError("Strings are not the same format, values cannot be matched")
+
+        format_string = format_string[arg_start + 1:]
+        input_string = input_string[arg_start:]
+
+        arg_end = format_string.find("}")
+        var_name = format_string[:arg_end]
+        format_string = format_string[arg_end + 1:]
+
+        var_length = 0
+        if ":" in var_name:
+            split = var_name.split(":")
+            var_name = split[0]
+            var_length = int(split[1])
+
+        if format_string:
+            if var_length:
+                sep_pos = var_length
+            else:
+                if "{" in format_string:
+                    sep = format_string[:format_string.find("{")]
+                else:
+                    sep = format_string
+                sep_pos = input_string.find(sep)
+            var_value = input_string[:sep_pos]
+            input_string = input_string[sep_pos:]
+        else:
+            var_value = input_string
+
+        if var_name != "*":
+            extracted_values[var_name] = var_value
+
+    return extracted_values
+
+
+def synthetic_paths(count, seed = 0):
+    rng = random.Random(seed)
+    gcms = ["ACCESS-CM2", "ACCESS-ESM1-5", "CESM2", "CMCC-ESM2", "EC-Earth3", "MPI-ESM1-2-HR", "NorESM2-MM", "UKESM1-0-LL"]
+    scenarios = ["historical", "ssp126", "ssp245", "ssp370", "ssp585"]
+    variables = ["tas", "tasmax", "tasmin", "pr", "prsn", "psl", "sfcWind", "hurs", "rsds"]
+    paths = []
+    for i in range(count):
+        var = rng.choice(variables)
+        gcm = rng.choice(gcms)
+        scenario = rng.choice(scenarios)
+        mdl_run = f"r{rng.randint(1, 10)}i1p1f1"
+        grid = rng.choice(["gn", "gr", "gr1"])
+        year = rng.randrange(1850, 2100, 5)
+        paths.append(f"{var}/{grid}/v2019{rng.randint(1000, 1231)}/{var}_day_{gcm}_{scenario}_{mdl_run}_{grid}_{year}0101-{year + 4}1231.nc")
+    # a few paths that do not follow the format, as found in real directories
+    for i in range(0, count, 1000):
+        paths[i] = paths[i].replace(".nc", ".json").replace("_day_", "-day-")
+    return paths
+
+
+def time_function(function, paths):
+    start = time.perf_counter()
+    matched = 0
+    for path in paths:
+        if function(path) is not None:
+            matched += 1
+    return time.perf_counter() - start, matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type = int, default = 1000000, help = "number of synthetic file paths")
+    args = parser.parse_args()
+
+    paths = synthetic_paths(args.count)
+
+    def legacy(path):
+        try:
+            return legacy_extract_from_format(FORMAT_FILE, path)
+        except ValueError:
+            return None
+
+    def compiled(path):
+        # looked up per path like the real callers would, so the cache lookup is included in the timing
+        return compile_format(FORMAT_FILE).match(path)
+
+    legacy_time, legacy_matched = time_function(legacy, paths)
+    compiled_time, compiled_matched = time_function(compiled, paths)
+
+    if legacy_matched != compiled_matched:
+        raise RuntimeError(f"Match counts differ: legacy {legacy_matched}, compiled {compiled_matched}")
+
+    print(f"{args.count} paths, {compiled_matched} matching")
+    print(f"extract_from_format (legacy): {legacy_time:.2f} s ({1e6 * legacy_time / args.count:.2f} us per path)")
+    print(f"compile_format(...).match:    {compiled_time:.2f} s ({1e6 * compiled_time / args.count:.2f} us per path)")
+    print(f"speedup: {legacy_time / compiled_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark clash resolution in dataset_info.get_files as the number of files in a dataset grows.
+Each size is a synthetic daily dataset (several variables, one file per year, two date_created versions
+for every file) created in a temporary directory. The directory walk is done before timing starts,
+so only the clash resolution is measured - the time per file should stay roughly constant.
+Usage: python benchmarks/bench_get_files.py [--sizes 1000 2000 4000 8000 16000]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_finder import dataset_info
+
+
+FORMAT_FILE = "/{var}/{date_created}/{var}_day_{year!start}0101-{year!end}1231.nc"
+VERSIONS = ["v20240101", "v20241216"]
+
+
+def make_dataset(root, file_count):
+    # two versions of every file, spread over variables of 150 years each
+    years_per_var = 150
+    var_count = max(1, file_count // (len(VERSIONS) * years_per_var))
+    for v in range(var_count):
+        for version in VERSIONS:
+            folder = os.path.join(root, f"var{v}", version)
+            os.makedirs(folder)
+            for year in range(1950, 1950 + years_per_var):
+                open(os.path.join(folder, f"var{v}_day_{year}0101-{year}1231.nc"), "w").close()
+    return var_count * len(VERSIONS) * years_per_var
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [1000, 2000, 4000, 8000, 16000], help = "approximate numbers of files")
+    args = parser.parse_args()
+
+    print(f"{'files':>8} {'get_files (s)':>14} {'us per file':>12}")
+    for size in args.sizes:
+        root = tempfile.mkdtemp(prefix = "dataset_finder_bench_")
+        try:
+            file_count = make_dataset(root, size)
+            dataset = dataset_info({}, root + os.sep, FORMAT_FILE)
+            dataset.prioritise("date_created", ["latest"], "high")
+
+            # walk the directory before timing
+            dataset.get_info()
+
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                files = dataset.get_files()
+                elapsed = time.perf_counter() - start
+
+            assert len(files) == file_count // len(VERSIONS)
+            print(f"{file_count:>8} {elapsed:>14.3f} {1e6 * elapsed / file_count:>12.1f}")
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
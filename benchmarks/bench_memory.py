@@ -0,0 +1,86 @@
+"""
+Benchmark the memory used to store the files of a collection, comparing the current layout with the one used before.
+For each scale a synthetic tree is made (see synthetic_tree.py) and searched, then the files of every dataset are
+stored again both ways while tracemalloc measures the memory allocated:
+- old: a (values, path) tuple with a dictionary of the values extracted from every file, plus a second list of
+  (values, path) tuples for the files in the selection (as get_generated_info used to keep)
+- new: a file_table for each root, with dictionary encoded values and directories, plus the indices of the
+  files in the selection
+The selection is the first variable, so the cached selection is only part of each dataset.
+Usage: python benchmarks/bench_memory.py [--key ACS_BC] [--scales 1 2 4 8] [--gcms 4] [--years 30] ...
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_finder import get_datasets, compile_format, file_table, search_matcher
+from synthetic_tree import PATHS_YML, DEFAULT_COUNTS, make_tree, add_count_arguments, field_values
+
+
+def old_layout(dataset, files, matcher):
+    pattern = compile_format(dataset.format_file.strip(os.sep))
+    tables = {root: [(pattern.match(directory + name), root + directory + name) for directory, name in root_files] for root, root_files in files.items()}
+    selected = [({key: value for key, value in values.items() if key not in dataset.data}, path)
+                for root in tables for values, path in tables[root] if matcher.match(values)]
+    return tables, selected
+
+
+def new_layout(dataset, files, matcher):
+    pattern = compile_format(dataset.format_file.strip(os.sep))
+    tables = {}
+    for root, root_files in files.items():
+        tables[root] = file_table(root)
+        for directory, name in root_files:
+            tables[root].append(pattern.match(directory + name), directory, name)
+    selected = [(table, table.select_rows(matcher)) for table in tables.values()]
+    return tables, selected
+
+
+def measure(layout, datasets, files, matcher):
+    tracemalloc.start()
+    kept = [layout(dataset, dataset_files, matcher) for dataset, dataset_files in zip(datasets, files)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--key", default = "ACS_BC", help = "entry of paths.yml to follow")
+    parser.add_argument("--yaml", default = PATHS_YML, help = "paths.yml to read the entry from")
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1, 2, 4, 8], help = "multiples of the number of GCMs")
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"{'scale':>5} {'datasets':>9} {'files':>8} {'old (MB)':>10} {'new (MB)':>10} {'old B/file':>11} {'new B/file':>11}")
+    for scale in args.scales:
+        counts = {name: getattr(args, name) for name in DEFAULT_COUNTS}
+        counts["gcms"] *= scale
+
+        root = tempfile.mkdtemp(prefix = "dataset_finder_bench_")
+        try:
+            yaml_path, file_count = make_tree(root, args.key, os.path.abspath(args.yaml), **counts)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                datasets = get_datasets(args.key, yaml_path)
+        finally:
+            shutil.rmtree(root)
+
+        # the (directory, name) of every file under each root, taken from the search so both layouts store the same files
+        files = [{table.root: [(table.dirs[table.dir_codes[index]], table.names[index]) for index in range(len(table))]
+                  for table, rows in dataset.get_rows(False)} for dataset in datasets]
+        matcher = search_matcher({"var": field_values("var", 1)}, exact_match = True)
+
+        old_size = measure(old_layout, datasets, files, matcher)
+        new_size = measure(new_layout, datasets, files, matcher)
+        print(f"{scale:>5} {len(datasets):>9} {file_count:>8} {old_size / 1e6:>10.1f} {new_size / 1e6:>10.1f} {old_size / file_count:>11.0f} {new_size / file_count:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark searches answered by a dataset_server against the same searches made directly, on synthetic trees of
+increasing size (see synthetic_tree.py). For each scale a server is started in this process on a temporary socket
+(standing in for a shared "python dataset_finder.py serve"), and once it has scanned the tree each search is made
+both ways and checked to give the same files. Served searches aren't allowed to fall back to searching directly,
+so a server that doesn't answer is an error rather than a second direct search. Times in seconds for:
+- scan: the server's scan of the whole tree, paid once instead of by every search
+- direct / served: get_datasets for every variable in turn, without a cache
+- direct_files / served_files: get_files for the first variable
+Usage: python benchmarks/bench_server.py [--key ACS_BC] [--scales 1 2 4 8] [--gcms 4] [--years 30] ...
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset_finder
+from dataset_finder import get_datasets, get_files, dataset_server
+from synthetic_tree import PATHS_YML, DEFAULT_COUNTS, make_tree, add_count_arguments, field_values
+
+
+@contextlib.contextmanager
+def no_fallback():
+    """
+    Raise an error whenever the server doesn't answer a search, instead of letting the client search directly.
+    """
+    ask_server = dataset_finder._ask_server
+
+    def answered(server, request):
+        reply = ask_server(server, request)
+        if reply is None or not ("datasets" in reply or "files" in reply):
+            raise AssertionError(f"the server didn't answer {request['command']}: {reply}")
+        return reply
+
+    dataset_finder._ask_server = answered
+    try:
+        yield
+    finally:
+        dataset_finder._ask_server = ask_server
+
+
+def run(key, yaml_path, socket_path, variables):
+    timings = {}
+
+    @contextlib.contextmanager
+    def timed(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = time.perf_counter() - start
+
+    with dataset_server(socket_path, yaml_path, cache = False) as server:
+        server.start()
+        with timed("scan"):
+            server.scan(key)
+
+        with timed("direct"):
+            direct = [get_datasets(key, yaml_path, exact_match = True, server = False, var = var).get_files() for var in variables]
+        with timed("served"), no_fallback():
+            served = [get_datasets(key, yaml_path, exact_match = True, server = socket_path, var = var).get_files() for var in variables]
+        with timed("direct_files"):
+            direct_files = get_files(key, yaml_path, exact_match = True, server = False, var = variables[0])
+        with timed("served_files"), no_fallback():
+            served_files = get_files(key, yaml_path, exact_match = True, server = socket_path, var = variables[0])
+
+    if direct != served or direct_files != served_files:
+        raise AssertionError("the server gave different files to searching directly")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--key", default = "ACS_BC", help = "entry of paths.yml to follow")
+    parser.add_argument("--yaml", default = PATHS_YML, help = "paths.yml to read the entry from")
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1, 2, 4, 8], help = "multiples of the number of GCMs")
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    header = None
+    for scale in args.scales:
+        counts = {name: getattr(args, name) for name in DEFAULT_COUNTS}
+        counts["gcms"] *= scale
+
+        root = tempfile.mkdtemp(prefix = "dataset_finder_bench_")
+        try:
+            yaml_path, file_count = make_tree(root, args.key, os.path.abspath(args.yaml), **counts)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                timings = run(args.key, yaml_path, os.path.join(root, "server.sock"), field_values("var", args.vars))
+        finally:
+            shutil.rmtree(root)
+
+        if header is None:
+            header = f"{'scale':>5} {'files':>8} " + " ".join(f"{name:>12}" for name in timings)
+            print(header)
+        print(f"{scale:>5} {file_count:>8} " + " ".join(f"{elapsed:>12.3f}" for elapsed in timings.values()))
+
+
+if __name__ == "__main__":
+    main()
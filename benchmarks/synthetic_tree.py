@@ -0,0 +1,118 @@
+"""
+Generate a synthetic directory tree of empty files following one of the entries in paths.yml, so that
+dataset_finder can be run and timed anywhere instead of needing the real data on /g/data.
+Every format_dirs of the entry is moved under the given directory, and a paths.yml pointing at the
+new locations is written there too (with the same key, format_file and unique as the original).
+Usage: python benchmarks/synthetic_tree.py OUTPUT_DIR [--key ACS_BC] [--gcms 4] [--years 30] ...
+"""
+import os
+import re
+import sys
+import argparse
+import itertools
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_finder import _load_paths
+
+
+PATHS_YML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paths.yml")
+
+# values for the fields that are varied, extended with made up names when more are asked for
+FIELD_VALUES = {
+    "org": ["BOM", "CSIRO", "UQ-DEC", "NSW-Government", "UQ-DES"],
+    "gcm": ["ACCESS-CM2", "ACCESS-ESM1-5", "CESM2", "CMCC-ESM2", "EC-Earth3", "MPI-ESM1-2-HR", "NorESM2-MM", "UKESM1-0-LL"],
+    "scenario": ["historical", "ssp126", "ssp370", "ssp245", "ssp585"],
+    "var": ["pr", "tas", "tasmax", "tasmin", "sfcWind", "rsds", "hurs", "psl"],
+}
+
+# values for every other field, fields not listed here take their own name as the value
+FIXED_VALUES = {
+    "grid": "AUS-05i",
+    "mdl_run": "r1i1p1f1",
+    "rcm": "BARPA-R",
+    "ver": "v1-r1",
+    "bc_org": "ACS",
+    "bc": "QME",
+    "ref": "AGCD",
+    "bc_period": "1960-2022",
+    "timescale": "day",
+    "*": "x",
+}
+
+DEFAULT_COUNTS = {"orgs": 3, "gcms": 4, "scenarios": 3, "vars": 4, "years": 30, "versions": 2}
+
+
+def field_values(name, count):
+    values = FIELD_VALUES[name]
+    return values[:count] + [f"{values[0]}{i}" for i in range(len(values), count)]
+
+
+def render(format_string, values):
+    # "{year!start:4}" looks up "year!start", lengths are left to the values
+    return re.sub(r"\{([^}:]*)(:\d+)?\}", lambda match: values.get(match.group(1), FIXED_VALUES.get(match.group(1), match.group(1))), format_string)
+
+
+def make_tree(output_dir, key = "ACS_BC", yaml_path = PATHS_YML, orgs = 3, gcms = 4, scenarios = 3, vars = 4, years = 30, versions = 2):
+    """
+    Create the tree and its paths.yml in output_dir.
+    Every combination of org, gcm and scenario is a dataset, spread over the format_dirs of the entry by org.
+    Each dataset has every variable and year in every date_created version, so there are clashes to resolve.
+    Only the first format_file of the entry is used.
+    Returns:
+    The path of the new paths.yml and the number of files created.
+    """
+    format_dirs_list, format_files_list, unique = _load_paths(key, yaml_path)
+    if isinstance(format_dirs_list, str):
+        format_dirs_list = [format_dirs_list]
+    if isinstance(format_files_list, str):
+        format_files_list = [format_files_list]
+    output_dir = os.path.abspath(output_dir)
+    new_dirs_list = [os.path.join(output_dir, format_dirs.lstrip(os.sep)) for format_dirs in format_dirs_list]
+    format_file = format_files_list[0]
+
+    date_created = [f"v2024{month:02}01" for month in range(1, versions + 1)]
+    # templates without some of the fields give the same path more than once
+    created = set()
+    for org_index, org in enumerate(field_values("org", orgs)):
+        format_dirs = new_dirs_list[org_index % len(new_dirs_list)]
+        for gcm, scenario in itertools.product(field_values("gcm", gcms), field_values("scenario", scenarios)):
+            first_year = 1960 if scenario == "historical" else 2015
+            for var, version, year in itertools.product(field_values("var", vars), date_created, range(first_year, first_year + years)):
+                values = {"org": org, "gcm": gcm, "scenario": scenario, "var": var, "date_created": version,
+                          "year!start": str(year), "year!end": str(year), "month!start": "01", "month!end": "12"}
+                path = render(format_dirs, values) + render(format_file, values)
+                if path in created:
+                    continue
+                created.add(path)
+                os.makedirs(os.path.dirname(path), exist_ok = True)
+                open(path, "w").close()
+
+    new_yaml_path = os.path.join(output_dir, "paths.yml")
+    with open(new_yaml_path, "w") as f:
+        yaml.safe_dump({key: {"format_dirs": new_dirs_list, "format_file": format_file, "unique": unique}}, f)
+    return new_yaml_path, len(created)
+
+
+def add_count_arguments(parser):
+    for name, default in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{name}", type = int, default = default, help = f"number of {name} (default {default})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir", help = "directory to create the tree in")
+    parser.add_argument("--key", default = "ACS_BC", help = "entry of paths.yml to follow")
+    parser.add_argument("--yaml", default = PATHS_YML, help = "paths.yml to read the entry from")
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    counts = {name: getattr(args, name) for name in DEFAULT_COUNTS}
+    yaml_path, file_count = make_tree(args.output_dir, args.key, os.path.abspath(args.yaml), **counts)
+    print(f"{file_count} files created, use get_datasets({args.key!r}, {yaml_path!r})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,134 @@
+import io
 import os
-import yaml
-import pandas as pd
+import copy
+import re
+import array
+import json
+import time
+import sqlite3
+import hashlib
+import socketserver
+import threading
+import fnmatch
+import functools
+import contextlib
+import collections.abc
+import concurrent.futures
+
+# pandas, tabulate, asyncio and yaml are only imported when they are used, so that scripts which only need
+# files (such as many short batch jobs) start quickly
+
+
+def tabulate(*args, **kwargs):
+    """
+    tabulate.tabulate, imported the first time a table is shown.
+    """
+    from tabulate import tabulate as make_table
+    return make_table(*args, **kwargs)
 
-from tabulate import tabulate
+
+class format_pattern:
+    """
+    A format string (as used by extract_from_format) compiled once into a regular expression, so that values
+    can be extracted from a large number of strings without parsing the format string every time.
+    Matching follows exactly the same rules as extract_from_format: a variable with no length ends at the first
+    occurrence of the characters following it, a variable with a length (e.g. "{ver:5}") takes that many characters,
+    and a variable at the very end of the format takes the rest of the string.
+    Use compile_format instead of creating these directly so that compiled patterns are shared.
+    Inputs:
+    - format_string - a string containing the format, with {} around variables
+    """
+    def __init__(self, format_string):
+        self.format_string = format_string
+
+        # (position in match groups, variable name) for every variable whose value is kept
+        self.fields = []
+
+        pattern = ""
+        group = 0
+        remaining = format_string
+        while "{" in remaining:
+            arg_start = remaining.find("{")
+            arg_end = remaining.find("}", arg_start)
+            if arg_end == -1:
+                raise ValueError(f'Unclosed variable in format string "{format_string}"')
+
+            pattern += re.escape(remaining[:arg_start])
+            var_name = remaining[arg_start + 1:arg_end]
+            remaining = remaining[arg_end + 1:]
+
+            # unspecified length
+            var_length = 0
+            if ":" in var_name:
+                split = var_name.split(":")
+                var_name = split[0]
+                var_length = int(split[1])
+
+            group += 1
+            if var_name != "*":
+                self.fields.append((group - 1, var_name))
+
+            # lookaheads are never backtracked into, so capturing inside one and then consuming the capture with a
+            # backreference stops the regex from trying other split points that extract_from_format would not try
+            if not remaining:
+                # nothing left after this variable, it takes everything
+                pattern += f"(?P<g{group}>.*)"
+            elif var_length:
+                pattern += f"(?=(?P<g{group}>.{{0,{var_length}}}))(?P=g{group})"
+            else:
+                sep = remaining[:remaining.find("{")] if "{" in remaining else remaining
+                if len(sep) == 1:
+                    # single character separator (the usual case), which can be done without a lookahead
+                    pattern += f"(?P<g{group}>[^{re.escape(sep)}]*)"
+                elif sep:
+                    # shortest value followed by the separator, i.e. up to its first occurrence
+                    pattern += f"(?=(?P<g{group}>.*?){re.escape(sep)})(?P=g{group})"
+                else:
+                    # two variables directly next to each other with no length - the first is always empty
+                    pattern += f"(?P<g{group}>)"
+
+        pattern += re.escape(remaining) + r"\Z"
+
+        # an empty format string matches anything without extracting values
+        self.regex = re.compile(pattern, re.DOTALL) if format_string else None
+
+    def __repr__(self):
+        return f"format_pattern({self.format_string!r})"
+
+    def match(self, input_string):
+        """
+        Extract values from an input string according to the compiled format.
+        Inputs:
+        - input_string - a string following the format whose values are to be extracted
+        Returns:
+        A dictionary mapping the names of the variables to the values found in input_string,
+        or None if the input string does not match the format.
+        """
+        if self.regex is None:
+            return {}
+        matched = self.regex.match(input_string)
+        if matched is None:
+            return None
+        groups = matched.groups()
+        return {var_name: groups[position] for position, var_name in self.fields}
+
+
+# compiled patterns are kept for the life of the session, there are only ever a handful of format strings
+_format_patterns = {}
+
+def compile_format(format_string):
+    """
+    Get the compiled format_pattern for a format string, compiling it on first use.
+    Inputs:
+    - format_string - a string containing the format, with {} around variables
+    Returns:
+    A format_pattern object whose match method can be used on any number of strings.
+    """
+    pattern = _format_patterns.get(format_string)
+    if pattern is None:
+        pattern = format_pattern(format_string)
+        _format_patterns[format_string] = pattern
+    return pattern
 
 
 def extract_from_format(format_string, input_string):
@@ -23,78 +149,12 @@ def extract_from_format(format_string, input_string):
     Returns:
     A dictionary mapping the names of the variables from format_string to the values found in input_string.
     """
-    extracted_values = {}
-    while format_string:
-        
-        # no variables left
-        if "{" not in format_string:
-            if format_string != input_string:
-                # print(format_string, input_string, extracted_values, sep, sep_pos)
-                raise ValueError("Strings are not the same format")
-            break
-        
-        # find argument start point
-        arg_start = format_string.find("{")
-    
-        # cut out non-variable filler (for example, "v1-r1-ACS-{bc}-{ref}" will become "bc}-{ref}"
-        # but first check it matches just in case the strings aren't the same format
-        if format_string[:arg_start] != input_string[:arg_start]:
-            raise ValueError("Strings are not the same format, values cannot be matched")
-            # break
-        
-        format_string = format_string[arg_start + 1:]
-        input_string = input_string[arg_start:]
-    
-        # find the next character after variable and use it to extract from check string
-        arg_end = format_string.find("}")
-        var_name = format_string[:arg_end]
-        format_string = format_string[arg_end + 1:]
-
-        # unspecified length
-        var_length = 0
-        
-        # find special formatting options for var
-        if ":" in var_name:
-            split = var_name.split(":")
-            var_name = split[0]
-            var_length = int(split[1])
-
-        # check if at end (i.e. nothing more to cut out)
-        if format_string:
-            if var_length:
-                sep_pos = var_length
-
-            else:
-                # get the separator (multiple characters to allow for year filtering later)
-                if "{" in format_string:
-                    sep_end = format_string.find("{")
-                    sep = format_string[:sep_end]
-                else:
-                    sep = format_string
-                sep_pos = input_string.find(sep)
-            var_value = input_string[:sep_pos]
-            input_string = input_string[sep_pos:]
-
-        else:
-            var_value = input_string
-
-        # match all - don't raise an error, but also don't keep result
-        if var_name != "*":
-            extracted_values[var_name] = var_value
-            # if var_name not in extracted_values:
-            #     extracted_values[var_name] = var_value
-            # else:
-            #     if isinstance(extracted_values[var_name], str):
-            #         if var_value != extracted_values[var_name]:
-            #             extracted_values[var_name] = [extracted_values[var_name], var_value]
-            #     else:
-            #         if var_value not in extracted_values[var_name]:
-            #             extracted_values[var_name].append(var_value)
-    
+    extracted_values = compile_format(format_string).match(input_string)
+    if extracted_values is None:
+        raise ValueError("Strings are not the same format")
     return extracted_values
 
 
-# important: this can be done in-place
 def match_values(arr, format_string, search_terms, exact_match = False, in_place = True, exact_match_dict = {}):
     """
     Takes a list of strings, extracts their values according to the given format, and tries to match them against
@@ -104,10 +164,12 @@ def match_values(arr, format_string, search_terms, exact_match = False, in_place
     is a substring of the string it is being tested against). Additionally, individual terms can be designated
     to be exact match terms or not, overriding the global value.
     Matches are not case sensitive, even if exact_match is True.
+    The search terms are not changed.
     Inputs:
     - arr: A list of strings in the format given by format_string
     - format_string: The format which will be used to extract values out of array strings for matching
-    - search_terms: A dictionary mapping variables names to values (can be individual or list for each value)
+    - search_terms: A dictionary mapping variables names to values (can be individual or list for each value),
+    or a search_matcher already made from them (in which case exact_match and exact_match_dict are not used)
     - exact_match: Whether to match exactly or by substring (default False)
     - in_place: Whether to modify arr in place or to create and return a new array (default True)
     - exact_match_dict: A dictionary mapping variable names to True or False values for whether they should
@@ -116,85 +178,1020 @@ def match_values(arr, format_string, search_terms, exact_match = False, in_place
     The original array of strings with any non-matching strings removed, or a new array with all matching
     strings included, depending on in_place.
     """
-    # turn strings into lists with a single term so that later loops don't loop by letter
-    for key in search_terms:
-        if isinstance(search_terms[key], str):
-            search_terms[key] = [search_terms[key]]
-
-    to_remove = []
+    if not isinstance(search_terms, search_matcher):
+        search_terms = search_matcher(search_terms, exact_match, exact_match_dict)
 
+    pattern = compile_format(format_string)
+    kept = []
     for item in arr:
+        extracted_values = pattern.match(item)
 
-        try:
-            extracted_values = extract_from_format(format_string, item)
-    
-            for key in extracted_values:
-                
-                check_value = extracted_values[key]
-                range_check = False
+        # failed to match the format, or failed against one of the search terms
+        if extracted_values is not None and search_terms.match(extracted_values):
+            kept.append(item)
+
+    if in_place:
+        arr[:] = kept
+        return arr
+    return kept
+
+
+def _never_matches(value):
+    return False
+
+
+def _compile_values(values, exact_match = False):
+    """
+    Compile the search values given for a single key into a function checking a (casefolded) value against them.
+    Values to match exactly are kept in a set, and values to match as substrings are joined into a single
+    regular expression, so each check is a single lookup or search however many values there are.
+    Inputs:
+    - values: A string, a search_term (see not_, glob_ and regex_), or a list of these
+    - exact_match: Whether strings are matched exactly or by substring
+    Returns:
+    A function taking a casefolded string and returning whether it matches any of the values.
+    """
+    values = [values] if isinstance(values, (str, search_term)) else values
+    try:
+        values = list(values)
+    except TypeError:
+        # values that can't be compared as strings (such as a single year as an integer) never match
+        return _never_matches
+
+    strings = [value for value in values if isinstance(value, str)]
+    terms = [value for value in values if isinstance(value, search_term)]
+    if len(strings) + len(terms) < len(values):
+        return _never_matches
+
+    checks = [term.compile(exact_match) for term in terms]
+    if strings and exact_match:
+        checks.append(frozenset(value.casefold() for value in strings).__contains__)
+    elif strings:
+        regex = re.compile("|".join(re.escape(value.casefold()) for value in strings))
+        checks.append(lambda check_value, search = regex.search: search(check_value) is not None)
+
+    if not checks:
+        return _never_matches
+    if len(checks) == 1:
+        return checks[0]
+    return lambda check_value: any(check(check_value) for check in checks)
+
+
+class search_term:
+    """
+    A search value matched in a different way to plain strings, made with not_, glob_ or regex_ and given like any
+    other search value, e.g. get_datasets("ACS_BC", gcm = not_("CESM2"), scenario = regex_("ssp[0-9]+")).
+    They can be used anywhere search terms are given (get_datasets, filter_all, select, etc.), and are checked
+    while searching like any other value, so directories that don't match aren't searched.
+    Matches are not case sensitive. ~term gives the opposite of a term, e.g. ~glob_("ssp*") is not_(glob_("ssp*")).
+    They can't be used for ranges such as years, which raises a ValueError.
+    Inputs:
+    - kind: "not", "glob" or "regex"
+    - values: The values to exclude (for "not"), or the patterns to match
+    """
+    def __init__(self, kind, values):
+        if kind not in ("not", "glob", "regex"):
+            raise ValueError(f'Unknown kind of search term "{kind}"')
+        self.kind = kind
+        self.values = tuple(values)
+
+    def __repr__(self):
+        return f"{self.kind}_({', '.join(repr(value) for value in self.values)})"
+
+    def __eq__(self, other):
+        return isinstance(other, search_term) and self.kind == other.kind and self.values == other.values
+
+    def __hash__(self):
+        return hash((self.kind, self.values))
+
+    def __invert__(self):
+        return not_(self)
+
+    def compile(self, exact_match = False):
+        """
+        Get a function checking a casefolded string against the term. exact_match is used for the plain strings
+        given to not_.
+        """
+        if self.kind == "not":
+            check = _compile_values(list(self.values), exact_match)
+            return lambda check_value: not check(check_value)
+
+        if self.kind == "glob":
+            pattern = "|".join(fnmatch.translate(value.casefold()) for value in self.values)
+            if not pattern:
+                return _never_matches
+            return lambda check_value, match = re.compile(pattern).match: match(check_value) is not None
+
+        pattern = "|".join(f"(?:{value})" for value in self.values)
+        if not pattern:
+            return _never_matches
+        return lambda check_value, search = re.compile(pattern, re.IGNORECASE).search: search(check_value) is not None
+
+    def matches(self, value, exact_match = False):
+        """
+        Check a single value against the term.
+        """
+        return self.compile(exact_match)(value.casefold())
+
+
+def not_(*values):
+    """
+    Search term matching anything except the given values, e.g. gcm = not_("CESM2") or var = not_("tasmax", "tasmin").
+    The values are matched the same way as any other search value (so by substring unless exact_match is True),
+    and can also be glob_ or regex_ terms.
+    """
+    return search_term("not", values)
+
+
+def glob_(*patterns):
+    """
+    Search term matching shell-style wildcard patterns (* for anything, ? for any character and [...] for any of
+    the characters inside), against the whole value, e.g. scenario = glob_("ssp*").
+    """
+    return search_term("glob", patterns)
+
+
+def regex_(*patterns):
+    """
+    Search term matching regular expressions anywhere in the value (use ^ and $ to match the whole value),
+    e.g. scenario = regex_("ssp[0-9]+").
+    """
+    return search_term("regex", patterns)
 
+
+def _data_matcher(terms, exact_match = False):
+    """
+    Compile the search terms given for a single key to dataset_info.match or dataset_info_collection.filter into
+    a function checking a value of a dataset's data. Plain strings are case sensitive (matched exactly, or as
+    substrings), while search_term objects (see not_, glob_ and regex_) are matched the same way as when searching.
+    Inputs:
+    - terms: A string, a search_term, or a list of these
+    - exact_match: Whether strings are matched exactly or by substring
+    Returns:
+    A function taking a value and returning whether it matches any of the terms.
+    """
+    if isinstance(terms, (str, search_term)):
+        terms = [terms]
+    terms = list(terms)
+    strings = [term for term in terms if not isinstance(term, search_term)]
+    checks = [term.compile(exact_match) for term in terms if isinstance(term, search_term)]
+
+    def check(value):
+        if exact_match:
+            if any(term == value for term in strings):
+                return True
+        elif any(term in value for term in strings):
+            return True
+        return any(check_term(value.casefold()) for check_term in checks)
+
+    return check
+
+
+class search_matcher:
+    """
+    Search terms compiled once so that they can be checked against the values extracted from a large number of
+    strings (see _compile_values). Matches are not case sensitive. Ranges (such as years) are compared as intervals,
+    any overlap is a match.
+    Inputs:
+    - search_terms: A dictionary mapping variable names to values (can be individual or list for each value)
+    - exact_match: Whether to match exactly or by substring (default False)
+    - exact_match_dict: A dictionary mapping variable names to True or False values for whether they should
+    be exact matches, overriding exact_match
+    """
+    def __init__(self, search_terms, exact_match = False, exact_match_dict = {}):
+        # function checking a single value for every key
+        self.matchers = {}
+
+        # search terms as merged lists of year_interval objects for comparing against ranges
+        self.ranges = {}
+
+        # the kind of the first search_term given for each key, as they can't be compared against ranges (see check_range)
+        self.term_kinds = {}
+
+        for key, values in search_terms.items():
+            self.ranges[key] = _merge_intervals(_to_intervals(values))
+            self.matchers[key] = _compile_values(values, exact_match_dict[key] if key in exact_match_dict else exact_match)
+            terms = [values] if isinstance(values, search_term) else values if isinstance(values, (list, set)) else []
+            kinds = [value.kind for value in terms if isinstance(value, search_term)]
+            if kinds:
+                self.term_kinds[key] = kinds[0]
+
+    def __repr__(self):
+        return f"search_matcher({list(self.matchers)})"
+
+    def __bool__(self):
+        return bool(self.matchers)
+
+    def check_range(self, key):
+        """
+        Raise ValueError if a key found to be a range (such as years) was searched with not_, glob_ or regex_,
+        which can only be used for strings.
+        """
+        if key in self.term_kinds:
+            raise ValueError(f'{self.term_kinds[key]}_ search terms can\'t be used for ranges such as "{key}"')
+
+    def match(self, extracted_values):
+        """
+        Check values extracted from a single string against the search terms.
+        Keys that are not being searched by match by default.
+        Raises ValueError if a range was searched with a search term that can't be used for it (see check_range).
+        Returns:
+        True if every searched key matches one of its search terms, otherwise False.
+        """
+        matchers = self.matchers
+        if self.term_kinds:
+            for key in extracted_values:
+                if key.endswith("!start"):
+                    self.check_range(key[:-len("!start")])
+        try:
+            for key, check_value in extracted_values.items():
                 if "!" in key:
                     split = key.split("!")
                     key = split[0]
 
-                    # todo: make more safe (check if start was there)
+                    # ranges are checked with their start, so an end without a start isn't checked at all,
+                    # while a start without an end never matches (as in file_table._range_matches)
                     if split[1] == "end":
                         continue
 
                     elif split[1] == "start":
-                        range_check = True
-                        check_value = year_range(check_value, extracted_values[f'{key}!end'])
-                
+                        end_value = extracted_values.get(f'{key}!end')
+                        if end_value is None:
+                            return False
+                        check_value = year_interval(check_value, end_value)
+                        if key in matchers and not any(check_value.overlaps(interval) for interval in self.ranges[key]):
+                            return False
+                        continue
+
                 # check if it's being searched by - if not, match by default
-                if key in search_terms:
-                    remove = True
-                    for value in search_terms[key]:
-                        if range_check:
-                            if value in check_value:
-                                remove = False
-                        else:
-                            if exact_match_dict[key] if key in exact_match_dict else exact_match:
-                                if value.casefold() == check_value.casefold():
-                                    remove = False
-                            else:
-                                if value.casefold() in check_value.casefold():
-                                    remove = False
-                    if remove:
-                        to_remove.append(item)
-                        
-                # already failed against one of the search terms, can move on to next item
-                if item in to_remove:
-                    break
+                if key in matchers and not matchers[key](check_value.casefold()):
+                    return False
 
         # failed to match properly
-        except:
-            to_remove.append(item)
+        except Exception:
+            return False
 
-    # use string method to modify existing list
-    if in_place:
-        for item in to_remove:
-            arr.remove(item)
-        return arr
+        return True
+
+
+def _list_dir(path, dirs_only = False):
+    """
+    List a directory, splitting its contents into subdirectories and files (both sorted).
+    Symbolic links to directories are counted as directories, the same as os.walk with followlinks = True.
+    Inputs:
+    - path: The directory to list
+    - dirs_only: If True, files are skipped and the returned file list is always empty
+    Returns:
+    A tuple of (dirs, files) lists of names, or None if the directory could not be read.
+    """
+    dirs = []
+    files = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry.name)
+                elif not dirs_only:
+                    files.append(entry.name)
+    except OSError:
+        return None
+    dirs.sort()
+    files.sort()
+    return dirs, files
+
+
+def _walk(start_path, levels, lister = _list_dir, threads = 1, prune = None, final = None, executor = None):
+    """
+    Walk down through the directory levels of a template, e.g. ["{var}", "{date_created}"], without going any deeper.
+    Levels are walked one at a time, listing all the directories of a level at the same time with a pool of threads.
+    On network filesystems most of the time spent walking is waiting on each listing, so listing directories
+    side by side is much faster than os.walk.
+    Only subdirectories are kept while walking down - files are only looked at in the final directories (see final).
+    Levels with no variables (such as "daily" or "CMIP6") are not listed at all, the directory is just checked to exist.
+    Symbolic links to directories are followed.
+    Results come out in sorted order, the same order os.walk would give with sorted directories.
+    Inputs:
+    - start_path: The directory to start from
+    - levels: A list of template path segments, one for each level of directories below start_path
+    - lister: A function taking a path (and dirs_only) and returning (dirs, files), or None if it could not be read
+    - threads: The number of directories to list at the same time (1 lists them one after the other)
+    - prune: A function taking (level, names) for the directory names found at a level and returning the names to keep
+    - final: None to yield the paths of the directories at the bottom level, otherwise "files" or "dirs" to list
+    those directories and yield their contents
+    - executor: An executor to list directories with instead of a new pool of threads (threads is then not used)
+    Yields:
+    Relative paths (from start_path) of the bottom level directories if final is None, otherwise tuples of
+    (relative path of bottom level directory, list of file or directory names within it).
+    """
+    for root, relative, names in _walk_roots([start_path], levels, lister, threads, prune, final, executor):
+        yield relative if final is None else (relative, names)
+
+
+def _walk_roots(roots, levels, lister = _list_dir, threads = 1, prune = None, final = None, executor = None):
+    """
+    Walk down the same directory levels under several roots at once (see _walk), listing each level of every root
+    together so that many small walks (such as one for each dataset) keep all the threads busy.
+    Yields:
+    Tuples of (root, relative path of bottom level directory, list of names within it or None if final is None),
+    in the order of the roots and then sorted.
+    """
+    if executor is None and threads > 1:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            yield from _walk_roots(roots, levels, lister, threads, prune, final, executor)
+        return
+    map_function = executor.map if executor is not None else map
+
+    frontier = [(root, "") for root in roots]
+    for level, segment in enumerate(levels):
+        if segment and "{" not in segment:
+            # fixed name, looked for in the listing of its parent so that it goes through the lister like any other level
+            paths = [os.path.join(root, relative) for root, relative in frontier]
+            frontier = [(root, os.path.join(relative, segment)) for (root, relative), listing in zip(frontier, map_function(lambda path: lister(path, True), paths))
+                        if listing is not None and segment in listing[0]]
+            continue
+
+        next_frontier = []
+        paths = [os.path.join(root, relative) for root, relative in frontier]
+        for (root, relative), listing in zip(frontier, map_function(lambda path: lister(path, True), paths)):
+            if listing is None:
+                continue
+            dirs = list(listing[0])
+            if prune is not None:
+                dirs = prune(level, dirs)
+            next_frontier.extend((root, os.path.join(relative, name)) for name in dirs)
+        frontier = next_frontier
+
+    if final is None:
+        for root, relative in frontier:
+            yield root, relative, None
+        return
+
+    paths = [os.path.join(root, relative) for root, relative in frontier]
+    for (root, relative), listing in zip(frontier, map_function(lister, paths)):
+        if listing is not None:
+            yield root, relative, list(listing[0] if final == "dirs" else listing[1])
+
+
+def _default_cache_path(key, format_dirs, format_file):
+    """
+    Get the location of the on-disk cache for an entry of paths.yml.
+    The cache is kept in the user's cache directory ($XDG_CACHE_HOME, or ~/.cache if not set), with a file name
+    made up of the key and a hash of the format strings so that editing an entry starts a new cache.
+    Inputs:
+    - key: The name of the paths entry
+    - format_dirs: The format_dirs of the entry (string or list)
+    - format_file: The format_file of the entry (string or list)
+    Returns:
+    The path of the SQLite cache file.
+    """
+    cache_root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    formats = json.dumps([format_dirs, format_file])
+    return os.path.join(cache_root, "dataset_finder", f"{key}-{hashlib.sha1(formats.encode()).hexdigest()[:12]}.sqlite")
+
+
+class directory_cache:
+    """
+    A cache of directory listings. Every time a directory is requested its modification time is checked,
+    and it is only listed again if it has changed since it was cached (adding or removing an entry in a
+    directory updates its modification time, so each directory only needs to be checked against itself).
+    Modification times are only as fine as the filesystem's clock, so an entry added in the same tick as a listing
+    would not change them - a directory modified within mtime_granularity seconds of being listed is listed again.
+    If given a path the listings are stored in an SQLite file so they can be reused by later sessions.
+    Inputs:
+    - path: The SQLite file to keep listings in. If None, the listings are only kept in memory
+    """
+    # number of new listings to hold before writing them to disk
+    flush_size = 1000
+    # seconds either side of a listing within which a modification time can't be trusted to show later changes
+    # (coarse timestamps on some filesystems, and clocks on file servers that differ from this machine's)
+    mtime_granularity = 2
+
+    def __init__(self, path = None):
+        self.path = path
+        self.listings = {}
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+            self.connection = sqlite3.connect(path, timeout = 60, check_same_thread = False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS listings (path TEXT PRIMARY KEY, mtime INTEGER, dirs TEXT, files TEXT, listed INTEGER)")
+            # caches written before the listing time was kept don't have the column, and their listings are checked again
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(listings)")]
+            if "listed" not in columns:
+                self.connection.execute("ALTER TABLE listings ADD COLUMN listed INTEGER")
+            self.connection.commit()
+
+    def __repr__(self):
+        return f"directory_cache({self.path!r}, hits = {self.hits}, misses = {self.misses})"
+
+    def __getstate__(self):
+        # the connection and lock can't be pickled (e.g. to send the cache to another process),
+        # so only the path is kept and the listings are read from the file again when needed
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def _lookup(self, path):
+        if path in self.listings:
+            return self.listings[path]
+        if self.connection is None:
+            return None
+        with self.lock:
+            row = self.connection.execute("SELECT mtime, listed, dirs, files FROM listings WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        # names can't contain null characters, so they are used to join the names into a single string
+        listing = (row[0], row[1], row[2].split("\0") if row[2] else [], row[3].split("\0") if row[3] else [])
+        self.listings[path] = listing
+        return listing
+
+    def list_dir(self, path, dirs_only = False):
+        """
+        List a directory, using the cached listing if the directory has not been modified since.
+        Inputs:
+        - path: The directory to list
+        - dirs_only: Only accepted to match _list_dir - cached listings always include files so that they can be reused
+        Returns:
+        A tuple of (dirs, files) lists of names, or None if the directory could not be read.
+        """
+        return self._cached_list_dir(path)[0]
+
+    def _cached_list_dir(self, path):
+        """
+        List a directory (see list_dir), also returning whether the cached listing was used.
+        Returns:
+        A tuple of (listing, hit), where hit is None if the directory could not be read.
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, None
+
+        cached = self._lookup(path)
+        if cached is not None and cached[0] == mtime and self._settled(mtime, cached[1]):
+            with self.lock:
+                self.hits += 1
+            return (cached[2], cached[3]), True
+
+        with self.lock:
+            self.misses += 1
+        listed = time.time_ns()
+        listing = _list_dir(path)
+        if listing is None:
+            return None, None
+
+        with self.lock:
+            self.listings[path] = (mtime, listed, *listing)
+            if self.connection is not None:
+                self.pending[path] = (mtime, listed, *listing)
+        if len(self.pending) >= self.flush_size:
+            self.flush()
+        return listing, False
+
+    def _settled(self, mtime, listed):
+        """
+        Check whether a directory's modification time was far enough before it was listed that any change
+        made after the listing would have changed the modification time.
+        Inputs:
+        - mtime: The modification time of the directory in nanoseconds
+        - listed: When the directory was listed in nanoseconds, or None if not known
+        Returns:
+        True if the cached listing can be trusted while the modification time stays the same.
+        """
+        return listed is not None and mtime < listed - self.mtime_granularity * 1_000_000_000
+
+    def flush(self):
+        """
+        Write any new listings to the cache file.
+        """
+        if self.connection is None:
+            return
+        with self.lock:
+            if not self.pending:
+                return
+            rows = [(path, mtime, "\0".join(dirs), "\0".join(files), listed) for path, (mtime, listed, dirs, files) in self.pending.items()]
+            self.pending = {}
+            self.connection.executemany("INSERT OR REPLACE INTO listings (path, mtime, dirs, files, listed) VALUES (?, ?, ?, ?, ?)", rows)
+            self.connection.commit()
+
+    def clear(self):
+        """
+        Remove every cached listing, both in memory and on disk.
+        """
+        with self.lock:
+            self.listings = {}
+            self.pending = {}
+            if self.connection is not None:
+                self.connection.execute("DELETE FROM listings")
+                self.connection.commit()
+
+    def close(self):
+        """
+        Write any new listings and close the cache file.
+        """
+        self.flush()
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+# caches opened from a path by _get_cache, kept open so that every search using the same file shares one
+# connection (and the listings already read from it) instead of opening the file again each time
+_open_caches = {}
+
+def _get_cache(cache, key = None, format_dirs = None, format_file = None):
+    """
+    Turn the "cache" argument accepted by get_datasets and filter_all into a directory_cache (or None).
+    Inputs:
+    - cache: False/None for no cache, True for the default on-disk cache, a path to an SQLite file,
+    or an existing directory_cache object
+    - key, format_dirs, format_file: Used to find the default cache location if cache is True
+    Returns:
+    A directory_cache object, or None if caching is not being used. Caches opened from a path are reused by
+    later calls with the same path, until they are closed.
+    """
+    if cache is None or cache is False:
+        return None
+    if isinstance(cache, directory_cache):
+        return cache
+    path = os.path.abspath(_default_cache_path(key, format_dirs, format_file) if cache is True else cache)
+    if path not in _open_caches or _open_caches[path].connection is None:
+        _open_caches[path] = directory_cache(path)
+    return _open_caches[path]
+
+
+class scan_stats:
+    """
+    Counts and timings from a search, for finding out where the time goes when a search is slow. Made by
+    filter_all, get_datasets or iter_datasets with stats = True and kept in the collection's "stats".
+    The same object is given to the datasets found, so time spent choosing files with get_files later on is
+    added to it too. Passing an existing scan_stats as stats adds to it instead of starting again.
+    Timings are in seconds. Apart from the total, they are added up over every thread (and process when
+    using workers) searching at the same time, so they can add up to more than the total.
+    - timings: A dictionary of time spent on each phase:
+        - total: The whole search, from start to finish
+        - listing: Listing directories, or checking them in the directory_cache
+        - matching: Extracting values from directory and file names with the format strings
+        - filtering: Matching directory names and files against the search terms
+        - collating: Collating the values in each dataset (get_info)
+        - clashes: Choosing files with get_files, including resolving clashes on unique keys
+    - dirs_listed: The number of directories listed (whether from disk or the directory_cache)
+    - entries_seen: The number of names found in those directories
+    - pruned: A dictionary mapping each level of format_dirs (e.g. "{gcm}") to the number of directories at
+    that level which didn't match the search terms and so weren't searched
+    - unmatched: The number of files (or directories, for a format_file ending in "/") not following the format_file
+    - files_found: The number of files following the format_file in the datasets searched
+    - files_yielded: The number of those files left in the datasets found, after selecting the search terms
+    - cache_hits, cache_misses: The number of listings reused from the directory_cache, or listed again
+    """
+    phases = ["total", "listing", "matching", "filtering", "collating", "clashes"]
+    counters = ["dirs_listed", "entries_seen", "unmatched", "files_found", "files_yielded", "cache_hits", "cache_misses"]
+
+    def __init__(self):
+        self.timings = {phase: 0.0 for phase in self.phases}
+        for name in self.counters:
+            setattr(self, name, 0)
+        self.pruned = {}
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        rows = [[f"{phase} (s)", f"{seconds:.3f}"] for phase, seconds in self.timings.items()]
+        rows += [[name, getattr(self, name)] for name in self.counters]
+        rows += [[f"pruned at {level}", count] for level, count in self.pruned.items()]
+        return tabulate(rows)
+
+    def __getstate__(self):
+        # the lock can't be pickled (e.g. to send the stats back from a worker process)
+        state = self.__dict__.copy()
+        state.pop("lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        """
+        Add to the counters, e.g. add(dirs_listed = 1).
+        """
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            self.timings[phase] += seconds
+
+    def add_pruned(self, level, count):
+        with self.lock:
+            self.pruned[level] = self.pruned.get(level, 0) + count
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        """
+        Context manager adding the time spent inside it to a phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def merge(self, other):
+        """
+        Add the counts and timings of another scan_stats (such as one from a worker process) to these.
+        """
+        with self.lock:
+            for phase, seconds in other.timings.items():
+                self.timings[phase] += seconds
+            for name in self.counters:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+            for level, count in other.pruned.items():
+                self.pruned[level] = self.pruned.get(level, 0) + count
+
+    def to_dict(self):
+        """
+        Get the stats as a dictionary, e.g. for saving as JSON or comparing searches.
+        """
+        return {"timings": dict(self.timings), **{name: getattr(self, name) for name in self.counters}, "pruned": dict(self.pruned)}
+
+
+def _get_stats(stats):
+    """
+    Turn the "stats" argument accepted by filter_all and get_datasets into a scan_stats (or None).
+    """
+    if stats is None or stats is False:
+        return None
+    if stats is True:
+        return scan_stats()
+    return stats
+
+
+def _timer(stats, phase):
+    """
+    Time a phase of a search into stats, or do nothing if stats is None.
+    """
+    return stats.timer(phase) if stats is not None else contextlib.nullcontext()
+
+
+def _list_dir_with_stats(path, dirs_only = False, cache = None, stats = None):
+    """
+    List a directory like _list_dir (or the cache's list_dir if given one), counting the listing in stats.
+    """
+    start = time.perf_counter()
+    if cache is not None:
+        listing, hit = cache._cached_list_dir(path)
+    else:
+        listing, hit = _list_dir(path, dirs_only), None
+    stats.add_time("listing", time.perf_counter() - start)
+
+    counts = {}
+    if listing is not None:
+        counts = {"dirs_listed": 1, "entries_seen": len(listing[0]) + len(listing[1])}
+    if hit is not None:
+        counts["cache_hits" if hit else "cache_misses"] = 1
+    stats.add(**counts)
+    return listing
+
+
+class file_table:
+    """
+    The files found under a single root, stored compactly as there can be millions of them in a collection.
+    Each column (a name from the format file, such as var or year!start) is dictionary encoded: its distinct
+    values are stored once, and each file only has a small integer code for its value. Directories are
+    encoded the same way, so the path of a file is the root, then its directory and its name.
+    Code 0 is kept for files without a value for a column (None), which can happen for files from catalogs.
+    Inputs:
+    - root: The start of every path in the table (can be "" for full paths)
+    """
+    __slots__ = ("root", "columns", "values", "codes", "dirs", "dir_codes", "names", "_positions", "_lookups", "_dir_lookup")
+
+    def __init__(self, root = ""):
+        self.root = root
+        # names of the values extracted from each file, in the order they appear in the format file
+        self.columns = []
+        self._positions = {}
+
+        # distinct values of each column and a lookup of their codes, and the code of every file's value
+        self.values = []
+        self._lookups = []
+        self.codes = []
+
+        # distinct directories (relative to the root), and the directory code and name of every file
+        self.dirs = []
+        self._dir_lookup = {}
+        self.dir_codes = array.array("I")
+        self.names = []
+
+    def __repr__(self):
+        return f"file_table({self.root!r}, files = {len(self.names)}, columns = {self.columns})"
+
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, extracted_values, directory, name):
+        """
+        Add a file to the table.
+        Inputs:
+        - extracted_values: A dictionary of the values extracted from the file's path
+        - directory: The directory of the file relative to the root, ending in a separator unless it's ""
+        - name: The name of the file (or folder) within the directory
+        """
+        for key in extracted_values:
+            if key not in self._positions:
+                # files added before the column have no value for it
+                self._positions[key] = len(self.columns)
+                self.columns.append(key)
+                self.values.append([None])
+                self._lookups.append({None: 0})
+                self.codes.append(array.array("I", bytes(len(self.names) * array.array("I").itemsize)))
+
+        for key, values, lookup, codes in zip(self.columns, self.values, self._lookups, self.codes):
+            value = extracted_values.get(key)
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(values)
+                values.append(value)
+            codes.append(code)
+
+        code = self._dir_lookup.get(directory)
+        if code is None:
+            code = self._dir_lookup[directory] = len(self.dirs)
+            self.dirs.append(directory)
+        self.dir_codes.append(code)
+        self.names.append(name)
+
+    def path(self, index):
+        return self.root + self.dirs[self.dir_codes[index]] + self.names[index]
+
+    def row(self, index, columns = None):
+        """
+        Get the values of a file as a file_row, optionally limited to a dictionary mapping the names of the
+        columns to include to their positions (see visible_columns).
+        """
+        return file_row(self, index, self.visible_columns() if columns is None else columns)
+
+    def visible_columns(self, exclude = ()):
+        """
+        Get a dictionary mapping the name of each column not in exclude to its position.
+        """
+        return {name: position for position, name in enumerate(self.columns) if name not in exclude}
+
+    def select_rows(self, matcher):
+        """
+        Find the files matching a search_matcher, giving the same result as checking the values of each file with
+        matcher.match, but checking each distinct value (or range) only once.
+        Returns:
+        The indices of the matching files, as a range if every file matches, otherwise an array.
+        """
+        rows = range(len(self.names))
+        if not matcher:
+            return rows
+
+        for position, name in enumerate(self.columns):
+            codes = self.codes[position]
+            key = name
+            if "!" in name:
+                split = name.split("!")
+                key = split[0]
+
+                # ranges are checked with their start, so an end without a start isn't checked at all
+                # (the same as a file without a start, see _range_matches)
+                if split[1] == "end":
+                    continue
+
+                elif split[1] == "start":
+                    matcher.check_range(key)
+                    end_position = self._positions.get(f"{key}!end")
+                    end_codes = self.codes[end_position] if end_position is not None else [0] * len(codes)
+                    pairs = set(zip(map(codes.__getitem__, rows), map(end_codes.__getitem__, rows)))
+                    allowed = {pair: self._range_matches(matcher, key, position, end_position, *pair) for pair in pairs}
+                    if not all(allowed.values()):
+                        rows = array.array("I", (index for index in rows if allowed[codes[index], end_codes[index]]))
+                    continue
+
+            # check if it's being searched by - if not, match by default
+            if key not in matcher.matchers:
+                continue
+            check = matcher.matchers[key]
+            allowed = [True] + [_check_value(check, value) for value in self.values[position][1:]]
+            if all(allowed):
+                continue
+            rows = array.array("I", (index for index in rows if allowed[codes[index]]))
+        return rows
+
+    def _range_matches(self, matcher, key, position, end_position, start_code, end_code):
+        # files without a start aren't checked, but those with a start and no end fail to match (as in search_matcher.match)
+        if start_code == 0:
+            return True
+        if end_code == 0:
+            return False
+        try:
+            check_value = year_interval(self.values[position][start_code], self.values[end_position][end_code])
+        except Exception:
+            return False
+        return key not in matcher.matchers or any(check_value.overlaps(interval) for interval in matcher.ranges[key])
+
+    def distinct(self, position, rows):
+        """
+        Get the set of codes of a column used by the files at the given indices.
+        """
+        codes = self.codes[position]
+        if isinstance(rows, range) and len(rows) == len(codes):
+            return set(codes)
+        return set(map(codes.__getitem__, rows))
+
+    def to_json(self, rows):
+        """
+        Get the files at the given indices as a dictionary that can be written as JSON (see from_json), e.g. to send
+        them from a dataset_server. Only the values and directories used by those files are kept, in the same order.
+        """
+        def encode(values, codes, used):
+            new_codes = {code: position for position, code in enumerate(used)}
+            return [values[code] for code in used], [new_codes[codes[index]] for index in rows]
+
+        encoded = {"root": self.root, "columns": self.columns, "values": [], "codes": [], "names": [self.names[index] for index in rows]}
+        for position, values in enumerate(self.values):
+            # code 0 is kept for None
+            column_values, column_codes = encode(values, self.codes[position], sorted(self.distinct(position, rows) | {0}))
+            encoded["values"].append(column_values)
+            encoded["codes"].append(column_codes)
+        encoded["dirs"], encoded["dir_codes"] = encode(self.dirs, self.dir_codes, sorted(set(map(self.dir_codes.__getitem__, rows))))
+        return encoded
+
+    @classmethod
+    def from_json(cls, encoded):
+        """
+        Make a file_table from a dictionary made by to_json.
+        """
+        table = cls(encoded["root"])
+        table.columns = list(encoded["columns"])
+        table._positions = {name: position for position, name in enumerate(table.columns)}
+        table.values = [list(values) for values in encoded["values"]]
+        table._lookups = [{value: code for code, value in enumerate(values)} for values in table.values]
+        table.codes = [array.array("I", codes) for codes in encoded["codes"]]
+        table.dirs = list(encoded["dirs"])
+        table._dir_lookup = {directory: code for code, directory in enumerate(table.dirs)}
+        table.dir_codes = array.array("I", encoded["dir_codes"])
+        table.names = list(encoded["names"])
+        return table
+
+
+def _check_value(check, value):
+    # values that can't be checked (such as numbers read from a catalog) don't match
+    try:
+        return check(value.casefold())
+    except Exception:
+        return False
 
-    # create new list
+
+class file_row(collections.abc.Mapping):
+    """
+    The values of a single file in a file_table, read directly from the table instead of being copied into
+    a dictionary. It can be used like a (read only) dictionary.
+    Inputs:
+    - table: The file_table the file is in
+    - index: The position of the file in the table
+    - columns: A dictionary mapping the names of the columns to include to their positions in the table
+    """
+    __slots__ = ("_table", "_index", "_columns")
+
+    def __init__(self, table, index, columns):
+        self._table = table
+        self._index = index
+        self._columns = columns
+
+    def __repr__(self):
+        return f"file_row({dict(self.items())})"
+
+    def __getitem__(self, key):
+        position = self._columns[key]
+        code = self._table.codes[position][self._index]
+        if code == 0:
+            raise KeyError(key)
+        return self._table.values[position][code]
+
+    def __contains__(self, key):
+        return key in self._columns and self._table.codes[self._columns[key]][self._index] != 0
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        table, index = self._table, self._index
+        return [name for name, position in self._columns.items() if table.codes[position][index]]
+
+    def values(self):
+        return [value for name, value in self.items()]
+
+    def items(self):
+        table, index = self._table, self._index
+        items = []
+        for name, position in self._columns.items():
+            code = table.codes[position][index]
+            if code:
+                items.append((name, table.values[position][code]))
+        return items
+
+
+def _split_format_file(format_file):
+    """
+    Split a format_file into the format of the paths within a dataset (without a leading or trailing separator),
+    its directory levels, and whether it's in folder mode (ending in a separator, so the final names are directories).
+    """
+    if format_file[0] == os.sep:
+        format_file = format_file[1:]
+
+    if format_file[-1] == os.sep:
+        folder_mode = True
+        format_file = format_file[:-1]
     else:
-        new_arr = [item for item in arr if item not in to_remove]
-        return new_arr
+        folder_mode = False
+
+    return format_file, format_file.split(os.sep)[:-1], folder_mode
+
+
+def _scan_pruner(scan_terms, levels, stats = None):
+    """
+    Make a prune function for _walk which drops directories within a dataset that can't match the search
+    terms the walk is limited to, given as {key: (values, exact_match)} (see dataset_info.scan_files). As with
+    format_dirs, directories are assumed to be named the same way as the files inside them (e.g. "{var}/{var}_{year}.nc").
+    Directories that don't follow their level of the format are kept, as the whole path is checked against the format later.
+    """
+    matcher = search_matcher({key: values for key, (values, exact_match) in scan_terms.items()},
+                             exact_match_dict = {key: exact_match for key, (values, exact_match) in scan_terms.items()})
+
+    checks = []
+    for level in levels:
+        level_pattern = compile_format(level)
+        checks.append((level_pattern, [name for position, name in level_pattern.fields if name in matcher.matchers]))
+
+    def prune(level, dirs):
+        level_pattern, keys = checks[level]
+        if not keys:
+            return dirs
+        kept = []
+        with _timer(stats, "filtering"):
+            for name in dirs:
+                values = level_pattern.match(name)
+                if values is None or all(matcher.matchers[key](values[key].casefold()) for key in keys):
+                    kept.append(name)
+        if stats is not None:
+            stats.add_pruned(levels[level], len(dirs) - len(kept))
+        return kept
+
+    return prune
 
 
 class dataset_info:
-    def __init__(self, data, root, format_file):
+    __slots__ = ("data", "roots", "format_file", "info", "generated_info_filtered", "generated_info_unfiltered", "info_str",
+                 "selected", "priority", "exact_match_dict", "cache", "threads", "stats", "_info_cache", "_summary", "_files",
+                 "_file_tables", "_scan_terms")
+
+    def __init__(self, data, root, format_file, cache = None, threads = 8):
         self.data = data
         # self.root = root
         self.roots = [root]
         self.format_file = format_file
         self.info = {}
+
+        # files in the selection (filtered) or all files (unfiltered), as (file_table, indices) pairs for each root
         self.generated_info_filtered = None
         self.generated_info_unfiltered = None
         self.info_str = ""
         self.selected = {}
         self.priority = {}
         self.exact_match_dict = {}
+        self.cache = cache
+        self.threads = threads
+
+        # scan_stats to record the time spent finding and choosing files in, if any
+        self.stats = None
+
+        # results kept until the selection, roots or priorities change (see refresh_info)
+        self._info_cache = {}
+        self._summary = None
+        self._files = None
+
+        # file_table of the values extracted from every file found under each root, from a single walk (see scan_files)
+        self._file_tables = {}
+
+        # search terms the walk was limited to as {key: (values, exact_match)}, so that directories within the
+        # dataset which can't match them aren't searched (see scan_files). The files are found again without
+        # them if the selection of those keys changes
+        self._scan_terms = {}
 
     def __repr__(self):
         return tabulate([*self.data.items()])
@@ -206,13 +1203,20 @@ class dataset_info:
         return tabulate([*self.table_data(False).items()], tablefmt = "html", headers=["Key", "Value"])
 
     def table_data(self, add_separator = True):
-        return self.data | ({'<th style="border-left: 2px solid"></th>': '<td style="border-left: 2px solid"></td>'} if add_separator else {}) | {key: merge_values(value) for key, value in self.get_info().items()}
+        if self._summary is None:
+            self._summary = {key: merge_values(value) for key, value in self.get_info().items()}
+        return self.data | ({'<th style="border-left: 2px solid"></th>': '<td style="border-left: 2px solid"></td>'} if add_separator else {}) | self._summary
 
     def select(self, exact_match = False, **kwargs):
+        changed = False
         for key in kwargs:
-            self.selected[key] = kwargs[key]
+            if key not in self.selected or self.selected[key] != kwargs[key] or self.exact_match_dict[key] != exact_match:
+                changed = True
+            # a copy is kept so that a list changed in place and selected again is seen as a change
+            self.selected[key] = copy.copy(kwargs[key])
             self.exact_match_dict[key] = exact_match
-        self.refresh_info()
+        if changed:
+            self.refresh_info(self._scan_terms_changed())
         # print(kwargs)
         return self
 
@@ -220,22 +1224,40 @@ class dataset_info:
         if isinstance(preferences, str):
             preferences = [preferences]
         
+        previous = self.priority[key].copy() if key in self.priority else None
         if key not in self.priority:
             self.priority[key] = {"default": default if default is not None else "error", "preferences": preferences}
         else:
             self.priority[key]["preferences"] = preferences
             if default is not None:
                 self.priority[key]["default"] = default
+
+        # chosen files depend on the priorities
+        if self.priority[key] != previous:
+            self._files = None
         return self
             
     def deselect(self, *args):
+        changed = False
         for key in args:
             if key in self.selected:
                 self.selected.pop(key)
                 self.exact_match_dict.pop(key)
-        self.refresh_info()
+                changed = True
+        if changed:
+            self.refresh_info(self._scan_terms_changed())
         return self
 
+    def _scan_terms_changed(self):
+        """
+        Check whether the selection no longer matches the search terms the walk was limited to (see scan_files),
+        in which case those files need to be found again. If so, the walk is no longer limited from then on.
+        """
+        changed = any(key not in self.selected or (self.selected[key], self.exact_match_dict[key]) != terms for key, terms in self._scan_terms.items())
+        if changed:
+            self._scan_terms = {}
+        return changed
+
     def keys(self):
         return self.data.keys()
 
@@ -243,9 +1265,7 @@ class dataset_info:
         return self.data.values()
 
     def any_files(self):
-        for output in self.generate_info(True):
-            return True
-        return False
+        return any(len(rows) for table, rows in self.get_rows(True))
 
     def attempt_merge(self, other):
         # Check whether their data is identical (both keys and values match)
@@ -257,96 +1277,131 @@ class dataset_info:
             # Combine the two by adding the other's root paths to this one
             new_roots = [root for root in other.roots if root not in self.roots]
             if new_roots:
+                # the other's files have already been found, so its tables are reused instead of walking again
+                # (as long as its walk was limited in the same way)
+                for root in new_roots:
+                    if root in other._file_tables and other._scan_terms == self._scan_terms:
+                        self._file_tables[root] = other._file_tables[root]
                 self.roots += new_roots
-                self.refresh_info(True)
+                self.refresh_info()
             return True
 
-    def get_generated_info(self, apply_filter):
+    def get_rows(self, apply_filter):
+        """
+        Get the files in the selection (or every file if apply_filter is False) as a list of (file_table, indices)
+        pairs, one for each root. The result is kept until the selection or roots change.
+        """
         if apply_filter:
             if self.generated_info_filtered is None:
-                self.generated_info_filtered = [output for output in self.generate_info(True)]
-            chosen = self.generated_info_filtered
+                self.generated_info_filtered = self._select_rows(True)
+            return self.generated_info_filtered
 
         else:
             if self.generated_info_unfiltered is None:
-                self.generated_info_unfiltered = [output for output in self.generate_info(False)]
-            chosen = self.generated_info_unfiltered
-            
-        for info, file in chosen:
-            yield info.copy(), file
+                self.generated_info_unfiltered = self._select_rows(False)
+            return self.generated_info_unfiltered
+
+    def get_generated_info(self, apply_filter):
+        """
+        Iterate over (values, path) pairs for the files in the selection (or every file if apply_filter is False),
+        where values is a file_row of the values extracted from the file's path that aren't in the dataset's data.
+        The rows are read from the dataset's tables rather than copied, so can't be changed.
+        """
+        for table, rows in self.get_rows(apply_filter):
+            columns = table.visible_columns(self.data)
+            for index in rows:
+                yield file_row(table, index, columns), table.path(index)
 
     def refresh_info(self, unfiltered = False):
+        """
+        Clear any results that were worked out from the dataset's files so they are made again when next needed.
+        If unfiltered is True, the files themselves are also found again from disk.
+        """
         self.generated_info_filtered = None
+        self.generated_info_unfiltered = None
+        self._info_cache = {}
+        self._summary = None
+        self._files = None
+        self.info_str = ""
         if unfiltered:
-            self.generated_info_unfiltered = None        
-            
-    def generate_info(self, apply_filter = True):
+            self._file_tables = {}
 
-        if self.format_file[0] == os.sep:
-            format_file = self.format_file[1:]
-        else:
-            format_file = self.format_file
+    def scan_files(self, lister = None, walked = None, executor = None):
+        """
+        Walk any roots that have not been walked yet, storing the values extracted from every file found.
+        Each root is only walked once, after which its table of files is reused by any selections or merges.
+        If the dataset was found by a search, directories that can't match its search terms are skipped.
+        Inputs:
+        - lister: A function for listing directories (see _walk). If not given, the dataset's cache is used
+        if it has one, otherwise directories are listed directly
+        - walked: A dictionary mapping roots to the (relative path, names) pairs from walking them already, e.g. together
+        with the roots of other datasets (see _find_datasets). Roots not in it are walked here
+        - executor: An executor to list directories with, instead of a new pool of the dataset's threads
+        Returns:
+        A list of the file_table for each root, in the order of the roots.
+        """
+        format_file, levels, folder_mode = _split_format_file(self.format_file)
 
-        if format_file[-1] == os.sep:
-            folder_mode = True
-            format_file = format_file[:-1]
-        else:
-            folder_mode = False
+        if lister is None:
+            if self.stats is not None:
+                lister = functools.partial(_list_dir_with_stats, cache = self.cache, stats = self.stats)
+            else:
+                lister = self.cache.list_dir if self.cache is not None else _list_dir
+        pattern = compile_format(format_file)
+        prune = _scan_pruner(self._scan_terms, levels, self.stats) if self._scan_terms else None
 
+        scanned = False
         for path_root in self.roots:
-            if "{" in format_file:
-                
-                first_arg_pos = format_file.find("{")
-        
-                # cut off by folder in case the variable wasn't immediately after /
-                slash_pos = format_file[first_arg_pos::-1].find(os.sep)
-                if slash_pos == -1:
-                    prev_separator_pos = -1
-                else:
-                    prev_separator_pos = first_arg_pos - slash_pos
-        
-                start_path = path_root + format_file[:prev_separator_pos + 1]
-                format_file = format_file[prev_separator_pos + 1:]
-                
+            if path_root in self._file_tables:
+                continue
+
+            table = file_table(path_root)
+            unmatched = 0
+            if walked is not None and path_root in walked:
+                listings = walked[path_root]
             else:
-                start_path = path_root + format_file
-                format_file = ""
+                listings = list(_walk(path_root, levels, lister, self.threads, prune, final = "dirs" if folder_mode else "files", executor = executor))
+            with _timer(self.stats, "matching"):
+                for short_root, files in listings:
+                    directory = os.path.join(short_root, "")
+                    for file in files:
+                        extracted_values = pattern.match(directory + file)
+                        if extracted_values is None:
+                            unmatched += 1
+                            continue
+                        table.append(extracted_values, directory, file)
+            self._file_tables[path_root] = table
+            scanned = True
 
-            for root, dirs, file_list in os.walk(start_path, followlinks = True):
-                dirs.sort()
-                file_list.sort()
+            if self.stats is not None:
+                self.stats.add(unmatched = unmatched, files_found = len(table))
 
-                # if format_file[-1] == os.sep:
-                if folder_mode:
-                    files = dirs
-                else:
-                    files = file_list
+        if scanned and self.cache is not None:
+            self.cache.flush()
 
-                # print(files)
-                
-                # how deep we are into the tree (root = 0)
-                level = 0
-    
-                short_root = root.replace(start_path, '')
-                if root != start_path:
-                    level = short_root.count(os.sep) + 1
-    
-                if level == format_file.count(os.sep):
-                    for i, file in enumerate(files):
-                        files[i] = os.path.join(short_root, file)
-    
-                    if apply_filter and self.selected:
-                        match_values(files, format_file, self.selected, in_place = True, exact_match_dict = self.exact_match_dict)
+        return [self._file_tables[path_root] for path_root in self.roots]
 
-                    # print(files)
-                    
-                    for file in files:
-                        try:
-                            values = {key: value for key, value in extract_from_format(format_file, file).items() if key not in self.data}
-                        except:
-                            # print(format_file, file)
-                            continue
-                        yield values, path_root + file
+    def _select_rows(self, apply_filter = True):
+        # files skipped by the search terms are needed without the filter
+        if not apply_filter and self._scan_terms:
+            self._scan_terms = {}
+            self.refresh_info(True)
+
+        tables = self.scan_files()
+
+        matcher = search_matcher(self.selected, exact_match_dict = self.exact_match_dict) if apply_filter else None
+
+        return [(table, table.select_rows(matcher) if matcher else range(len(table))) for table in tables]
+
+    def generate_info(self, apply_filter = True):
+        """
+        Iterate over (values, path) pairs for the files in the selection (or every file if apply_filter is False),
+        like get_generated_info but without keeping the result.
+        """
+        for table, rows in self._select_rows(apply_filter):
+            columns = table.visible_columns(self.data)
+            for index in rows:
+                yield file_row(table, index, columns), table.path(index)
     
     def collate_info(self, apply_filter = True):
         def collate_info_recursive(current_dict, info):
@@ -381,47 +1436,80 @@ class dataset_info:
                         collate_info_recursive(new_dict, info)
 
         collated_info = {}
-        self.info = {}
         
         # for info, file in self.generate_info(apply_filter):
-        for info, file in self.get_generated_info(apply_filter):
+        for row, file in self.get_generated_info(apply_filter):
+            info = dict(row)
             to_pop = []
             for key in list(info.keys()):
-                new_value = [info[key]]
-
                 if "!" in key:
                     to_pop.append(key)
                     split = key.split("!")
-                    key = split[0]
 
                     # todo: make more safe (check if start was there)
-                    if split[1] == "end":
-                        continue
-
-                    elif split[1] == "start":
-                        range_check = True
-                        new_value = year_range(new_value[0], info[f'{key}!end'])
-                        info[key] = new_value
-                        
-                if key not in self.info:
-                    self.info[key] = new_value
-                else:
-                    for item in new_value:
-                        if item not in self.info[key]:
-                            self.info[key].append(item)
-                            # self.info[key] = self.info[key] + new_value
-                    self.info[key].sort()
+                    if split[1] == "start":
+                        info[split[0]] = [year_interval(info[key], info[f'{split[0]}!end'])]
             for pop_key in to_pop:
                 info.pop(pop_key)
             collate_info_recursive(collated_info, info)
+
+        self.get_info(apply_filter)
         return collated_info
 
+    def _collate_flat(self, apply_filter = True):
+        """
+        Collate the unique values of every key across all files (the dictionary returned by get_info),
+        without building the nested tree that collate_info makes for print_info.
+        """
+        values = {}
+        for table, rows in self.get_rows(apply_filter):
+            # only the distinct values in each column are needed, rather than reading every file
+            for name, position in table.visible_columns(self.data).items():
+                key = name
+                codes = table.distinct(position, rows)
+                codes.discard(0)
+                if not codes:
+                    continue
+
+                found = [table.values[position][code] for code in codes]
+                if "!" in name:
+                    split = name.split("!")
+                    key = split[0]
+
+                    # ranges are collated with their start, so an end without a start is left out
+                    # (as in collate_info), while a start without an end is an error
+                    if split[1] == "end":
+                        continue
+
+                    elif split[1] == "start":
+                        end_position = table._positions.get(f'{key}!end')
+                        if end_position is None:
+                            raise KeyError(f'{key}!end')
+                        end_codes = table.codes[end_position]
+                        pairs = set(zip(map(table.codes[position].__getitem__, rows), map(end_codes.__getitem__, rows)))
+                        found = [year_interval(table.values[position][start], table.values[end_position][end]) for start, end in pairs if start]
+
+                # dict keys act as an ordered set
+                if key not in values:
+                    values[key] = {}
+                values[key].update(dict.fromkeys(found))
+
+        collated = {}
+        for key, found in values.items():
+            if isinstance(next(iter(found)), year_interval):
+                collated[key] = _merge_intervals(found)
+            else:
+                collated[key] = sorted(found)
+        return collated
+
     def get_info(self, apply_filter = True):
-        self.collate_info(apply_filter)
-        
-        # if not self.info:
-        #     self.collate_info()
-    
+        """
+        Get a dictionary of every value found in the dataset's files for each key (e.g. variables and years).
+        The result is kept until the selection or roots change, so this can be called repeatedly.
+        """
+        if apply_filter not in self._info_cache:
+            self._info_cache[apply_filter] = self._collate_flat(apply_filter)
+        self.info = self._info_cache[apply_filter]
         return self.info
 
     def print_info(self):
@@ -469,24 +1557,14 @@ class dataset_info:
     #         return any(term in self.data[key] for term in match_terms)
     
     def match(self, exact_match = False, **search_terms):
-
-        # currently_matching = False
-        
-        for key in search_terms:
-            if isinstance(search_terms[key], str):
-                search_terms[key] = [search_terms[key]]
-
-            if key not in self.data:
+        """
+        Checks whether the dataset's own values (those in data, not those of its files) match the given search terms.
+        Plain strings are case sensitive, and not_, glob_ and regex_ terms are matched as when searching (see _data_matcher).
+        Keys that aren't in data never match.
+        """
+        for key, terms in search_terms.items():
+            if key not in self.data or not _data_matcher(terms, exact_match)(self.data[key]):
                 return False
-
-            ## FIX THIS
-            if exact_match:
-                if not any(term == self.data[key] for term in search_terms[key]):
-                    return False
-            else:
-                if not any(term in self.data[key] for term in search_terms[key]):
-                    return False
-
         return True
 
 
@@ -500,11 +1578,27 @@ class dataset_info:
                 return False
                 
             values = kwargs[key]
-            if isinstance(values, str):
+            if isinstance(values, (str, year_interval, search_term)) or _is_interval_tuple(values):
                 values = [values]
+
+            # ranges (such as years) are only included if every searched year is covered
+            if self.get_info()[key] and isinstance(self.get_info()[key][0], year_interval):
+                search_matcher({key: values}).check_range(key)
+                for value in values:
+                    try:
+                        interval = _to_interval(value)
+                    except (TypeError, ValueError):
+                        return False
+                    if not any(interval in term for term in self.get_info()[key]):
+                        return False
+                continue
                 
             for value in values:
-                if exact_match:
+                if isinstance(value, search_term):
+                    check = value.compile(exact_match)
+                    if not any(check(term.casefold()) for term in self.get_info()[key]):
+                        return False
+                elif exact_match:
                     if not any(value == term for term in self.get_info()[key]):
                         return False
                 else:
@@ -522,26 +1616,40 @@ class dataset_info:
     def get_files(self):
         """
         Get files for loading the dataset according to current selection, and attempt to resolve any clashes for unique terms.
+        The chosen files are kept until the selection, roots or priorities change.
+        """
+        files, messages = self._choose_files()
+        for message in messages:
+            print(message)
+        return list(files)
+
+    def _choose_files(self):
+        """
+        Choose the files for get_files without printing the clash messages (e.g. for a dataset_server).
+        Returns:
+        A tuple of (files, messages), kept until the selection, roots or priorities change.
         """
+        if self._files is not None:
+            return self._files
 
-        # WIP
-        current_files = []
+        start = time.perf_counter()
+
+        # files that clash can only differ on priority keys, so files are grouped by their values for every other key
+        # and each new file only has to be checked against the file currently chosen for its group
+        # (dict order is the order files were chosen in, which is the order they are returned in)
+        current_files = {}
         clashes = {}
         # for new_info, new_file in self.generate_info(True):
-        for new_info, new_file in self.get_generated_info(True):
+        for new_info, new_file, group in self._grouped_rows():
             to_append = True
-            for old_info, old_file in current_files:
+            if group in current_files:
+                old_info, old_file = current_files[group]
                 unmatching_keys = [key for key in new_info.keys() if new_info[key] != old_info[key]]
 
                 # identical entry detected
                 if not unmatching_keys:
                     # print("identical entry warning")
                     to_append = False
-                    break
-
-                # non-identical entry with clash on non-priority key (such as year)
-                if any(key not in self.priority for key in unmatching_keys):
-                    continue
 
                 # non-identical entry with clash only on priority key(s) (such as date_created)
                 else:
@@ -597,7 +1705,8 @@ class dataset_info:
                     to_append = prev_to_append
                     
                     if to_append:
-                        current_files.remove((old_info, old_file))
+                        # removed so that the new file goes to the end, where it would be if it had not clashed
+                        current_files.pop(group)
 
                     if key not in clashes:
                         clashes[key] = {}
@@ -624,31 +1733,92 @@ class dataset_info:
                                     continue
             
                                 elif split[1] == "start":
-                                    range_check = True
-                                    info_value = year_range(info_value[0], clash_info[f'{info_key}!end'])
+                                    info_value = [year_interval(info_value[0], clash_info[f'{info_key}!end'])]
 
                             if info_key not in clashes[key][clash_details]:
                                 clashes[key][clash_details][info_key] = info_value
                             else:
                                 clashes[key][clash_details][info_key] += [add_value for add_value in info_value if add_value not in clashes[key][clash_details][info_key]]
                     
-                    break
-                    
             if to_append:
-                current_files.append((new_info, new_file))
-            
-            # pass
+                current_files[group] = (new_info, new_file)
+
+        if self.stats is not None:
+            self.stats.add_time("clashes", time.perf_counter() - start)
 
+        messages = []
         for clash_key, clash_dict in clashes.items():
             for clash_details in clash_dict.keys():
-                print(f'INFO: Clash on {clash_key}: Chose {clash_details} for ' + "; ".join([f'{key} = {merge_values(value)}' for key, value in clash_dict[clash_details].items()]))
+                messages.append(f'INFO: Clash on {clash_key}: Chose {clash_details} for ' + "; ".join([f'{key} = {merge_values(value)}' for key, value in clash_dict[clash_details].items()]))
+
+        files = [(file).replace(2 * os.sep, os.sep) for (info, file) in current_files.values()]
+        self._files = (files, messages)
+        return self._files
+
+    def _grouped_rows(self):
+        """
+        Iterate over (values, path, group) for the files in the selection, where group is a tuple of the file's values
+        for every key that isn't prioritised (see get_files). The tables are decoded a column at a time, and the values
+        are only kept by get_files for the files it has chosen so far.
+        """
+        for table, rows in self.get_rows(True):
+            names = []
+            columns = []
+            missing = False
+            for name, position in table.visible_columns(self.data).items():
+                codes = table.codes[position] if isinstance(rows, range) else list(map(table.codes[position].__getitem__, rows))
+                names.append(name)
+                columns.append(list(map(table.values[position].__getitem__, codes)))
+                missing = missing or 0 in codes
+
+            group_columns = [column for name, column in zip(names, columns) if name not in self.priority]
+            groups = zip(*group_columns) if group_columns else [()] * len(rows)
+            for index, values, group in zip(rows, zip(*columns) if columns else [()] * len(rows), groups):
+                if missing:
+                    # files without a value for a key don't have the key
+                    yield {name: value for name, value in zip(names, values) if value is not None}, table.path(index), tuple(value for value in group if value is not None)
+                else:
+                    yield dict(zip(names, values)), table.path(index), group
 
-        return [(file).replace(2 * os.sep, os.sep) for (info, file) in current_files]
+    async def aget_files(self):
+        """
+        Asynchronous version of get_files, which works in a worker thread so the event loop isn't blocked
+        (for example if the dataset's files still need to be found).
+        """
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_files)
 
         
         # return [(self.root + file).replace(2 * os.sep, os.sep) for (info, file) in self.generate_info(True)]
         # return [(file).replace(2 * os.sep, os.sep) for (info, file) in self.generate_info(True)]
 
+    def catalog_rows(self, apply_filter = True):
+        """
+        Get a row for every file in the dataset, as written by dataset_info_collection.to_intake_esm.
+        Each row has the dataset's data and every value extracted from the file's path, with ranges split
+        into start_{key} and end_{key} columns (e.g. year!start and year!end become start_year and end_year),
+        followed by the file's path, the root it was found under and the dataset's format_file.
+        Inputs:
+        - apply_filter: Whether to only include files in the current selection (default True)
+        Returns:
+        A list of dictionaries, one for each file.
+        """
+        rows = []
+        for values, file in self.generate_info(apply_filter):
+            row = self.data.copy()
+            for key, value in values.items():
+                if "!" in key:
+                    name, part = key.split("!")
+                    key = f"{part}_{name}"
+                row[key] = value
+
+            root = next(root for root in self.roots if file.startswith(root))
+            row["path"] = file.replace(2 * os.sep, os.sep)
+            row["root"] = root
+            row["format_file"] = self.format_file
+            rows.append(row)
+        return rows
+
     def to_df_table(self):
         """
         UNTESTED WITH RECENT CHANGES, AVOID USING
@@ -682,29 +1852,67 @@ class dataset_info:
 
 
 class dataset_info_collection:
+    # number of rows in each row group of Parquet catalogs (see to_intake_esm), smaller groups let
+    # more of a catalog be skipped when it is read with search terms
+    catalog_row_group_size = 100000
+
+    # largest number of rows shown in full by _repr_html_, larger collections only show max_rows of them (at least one),
+    # split between the first and last rows (like pandas' display.max_rows). None shows every row
+    max_rows = 60
+
     def __init__(self, items = []):
         if items:
             self.items = items
         else:
             self.items = []
 
+        # inverted index of item data, see get_index
+        self._index = None
+        self._indexed_items = None
+
+        # (function, keyword arguments) of the search that made the collection, see refresh
+        self._search = None
+
+        # the changes since an earlier search, if made with get_datasets(..., since = ...)
+        self.changes = None
+
+        # scan_stats of the search that made the collection, if made with stats = True
+        self.stats = None
+
     def add(self, item):
         """
         Add a new dataset_info object to the collection.
         """
         self.items.append(item)
+        self._index = None
+
+    def get_index(self):
+        """
+        Get the inverted index of the collection, which maps each key to a dictionary of every value it has
+        (in the order they first appear) and the positions of the items with that value.
+        The index is built the first time it is needed, and rebuilt if the items have changed since (added, removed,
+        replaced or reordered, e.g. by items.sort()), or keys have been added to or removed from their data (e.g. by condense).
+        """
+        # the items and data the index was built from are kept (rather than their ids) so that they can't be reused
+        if self._index is None or not self._index_is_current():
+            index = {}
+            for position, item in enumerate(self.items):
+                for key, value in item.data.items():
+                    index.setdefault(key, {}).setdefault(value, []).append(position)
+            self._index = index
+            self._indexed_items = [(item, item.data, len(item.data)) for item in self.items]
+        return self._index
+
+    def _index_is_current(self):
+        indexed = self._indexed_items
+        return len(indexed) == len(self.items) and all(
+            indexed_item is item and data is item.data and length == len(data) for (indexed_item, data, length), item in zip(indexed, self.items))
 
     def get_all(self, key):
         """
         Get every unique entry for a given key.
         """
-        all_list = []
-        for item in self.items:
-            if key in item.data:
-                value = item.data[key]
-                if value not in all_list:
-                    all_list.append(value)
-        return all_list
+        return list(self.get_index().get(key, {}))
 
     def prioritise(self, key, preferences = [], default = None):
         for item in self.items:
@@ -744,16 +1952,45 @@ class dataset_info_collection:
             files = files + item.get_files()
         return files
 
+    async def aget_files(self):
+        """
+        Asynchronous version of get_files, which works in a worker thread so the event loop isn't blocked.
+        """
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_files)
+
     def filter(self, exact_match = False, **kwargs):
         """
         Return a new dataset_info_collection containing only entries that match the given keyword argument search terms.
+        Matching works the same as dataset_info.match, but is done on the index (see get_index) so that each
+        distinct value is only checked once, rather than checking every item.
         """
-        return dataset_info_collection([item for item in self.items if item.match(exact_match, **kwargs)])
+        index = self.get_index()
+        positions = None
+        for key, terms in kwargs.items():
+            check = _data_matcher(terms, exact_match)
+            found = set()
+            for value, value_positions in index.get(key, {}).items():
+                if check(value):
+                    found.update(value_positions)
+
+            positions = found if positions is None else positions & found
+            if not positions:
+                break
+
+        if positions is None:
+            return dataset_info_collection(list(self.items))
+        return dataset_info_collection([self.items[position] for position in sorted(positions)])
 
     def _compare_collections(self, other, match_keys, exclude_keys):
-        matched = []
-        unmatched = []
-
+        """
+        Split the items of this collection into those that do or do not match any item of another collection
+        (compared on match_keys, or on their common keys minus exclude_keys).
+        This is a hash join - the items on the smaller side are put in a dict keyed on the values being compared,
+        which is then looked up with the items from the other side - instead of comparing every pair of items.
+        As when comparing pairs in order, an item of other that is missing one of the match_keys (or that has no
+        common keys to compare with) stops any later items of other from being compared.
+        """
         if match_keys is not None and exclude_keys is not None:
             raise ValueError("Can specify either match_keys or exclude_keys but not both")
 
@@ -765,45 +2002,72 @@ class dataset_info_collection:
 
         if isinstance(exclude_keys, str):
             exclude_keys = [exclude_keys]
-        
-        for item in self.items:
-            success = False
-            
-            for check in other.items:
-                if match_keys:
-                    common_keys = match_keys
 
-                    # item does not contain all the requisite keys for comparing
-                    if any([key not in item.keys() for key in common_keys]):
-                        break
-
-                    # check does not contain all the requisite keys for comparing
-                    if any([key not in check.keys() for key in common_keys]):
-                        break
-                        
+        # keys to compare between an item and an item of other, or None if nothing can be compared
+        def compare_keys(item_keys, check_keys):
+            if match_keys:
+                if any(key not in check_keys for key in match_keys):
+                    return None
+                return tuple(match_keys)
+
+            # match based on common columns, minus any specified keys
+            common_keys = item_keys & check_keys
+            if exclude_keys:
+                common_keys = common_keys - set(exclude_keys)
+
+            # no common column to match between
+            if not common_keys:
+                return None
+            return tuple(sorted(common_keys))
+
+        # items on each side grouped by their set of keys (usually every item has the same keys)
+        def group_by_keys(items):
+            groups = {}
+            for position, item in enumerate(items):
+                groups.setdefault(frozenset(item.keys()), []).append(position)
+            return groups
+
+        item_groups = group_by_keys(self.items)
+        check_groups = group_by_keys(other.items)
+        is_matched = [False] * len(self.items)
+
+        for item_keys, item_positions in item_groups.items():
+
+            # item does not contain all the requisite keys for comparing
+            if match_keys and any(key not in item_keys for key in match_keys):
+                continue
+
+            # position in other where comparing stops for these items
+            stop = len(other.items)
+            joins = []
+            for check_keys, check_positions in check_groups.items():
+                keys = compare_keys(item_keys, check_keys)
+                if keys is None:
+                    stop = min(stop, check_positions[0])
                 else:
-                    # match based on common columns
-                    common_keys = item.keys() & check.keys()
+                    joins.append((keys, check_positions))
 
-                    # remove any specified keys
-                    if exclude_keys:
-                        common_keys = common_keys ^ set(exclude_keys)
-
-                    # no common column to match between
-                    if not common_keys:
-                        break
-
-                # check for match
-                success = all([item.data[key] == check.data[key] for key in common_keys])
+            for keys, check_positions in joins:
+                check_positions = [position for position in check_positions if position < stop]
+                if not check_positions:
+                    continue
 
-                # successful match, end early
-                if success:
-                    break
+                # build on the smaller side, probe with the larger one
+                if len(check_positions) <= len(item_positions):
+                    index = {tuple(other.items[position].data[key] for key in keys) for position in check_positions}
+                    for position in item_positions:
+                        if tuple(self.items[position].data[key] for key in keys) in index:
+                            is_matched[position] = True
+                else:
+                    index = {}
+                    for position in item_positions:
+                        index.setdefault(tuple(self.items[position].data[key] for key in keys), []).append(position)
+                    for position in check_positions:
+                        for matched_position in index.pop(tuple(other.items[position].data[key] for key in keys), []):
+                            is_matched[matched_position] = True
 
-            if success:
-                matched.append(item)
-            else:
-                unmatched.append(item)
+        matched = [item for item, success in zip(self.items, is_matched) if success]
+        unmatched = [item for item, success in zip(self.items, is_matched) if not success]
 
         return matched, unmatched
 
@@ -815,30 +2079,141 @@ class dataset_info_collection:
         matched, unmatched = self._compare_collections(other, match_keys, exclude_keys)
         return dataset_info_collection(unmatched)
 
+    def find_matches_and_missing(self, other, match_keys = None, exclude_keys = None):
+        """
+        Equivalent to (find_matches(...), find_missing(...)) but only compares the collections once.
+        Returns:
+        A tuple of two dataset_info_collection objects, the entries with and without a match in other.
+        """
+        matched, unmatched = self._compare_collections(other, match_keys, exclude_keys)
+        return dataset_info_collection(matched), dataset_info_collection(unmatched)
+
     def to_dataframe(self):
+        import pandas as pd
+
         # return pd.DataFrame([item.data for item in self.items])
         # return pd.DataFrame([item.table_data() for item in self.items])
         return pd.DataFrame([item.to_df_table() for item in self.items])
 
+    def to_intake_esm(self, path, name = None, description = None, apply_filter = True):
+        """
+        Write the collection out as an intake-esm catalog, so that it can be searched later without walking
+        through the directories again. A table with one row per file is written to path (Parquet if it ends
+        in .parquet or .pq, which needs pyarrow, or CSV if it ends in .csv or .csv.gz), along with the
+        esm-collection JSON description next to it (the same name ending in .json), which is what
+        intake.open_esm_datastore should be given.
+        The table's columns are described in dataset_info.catalog_rows. The dataset keys (the keys in each
+        dataset's data) are used as the groupby_attrs, so each intake-esm dataset is a dataset_info.
+        Inputs:
+        - path: The file to write the table to
+        - name: The id of the catalog (default the file name without its extension)
+        - description: A description of the catalog
+        - apply_filter: Whether to only include files in the current selection (default True)
+        Returns:
+        The path of the JSON file.
+        """
+        for extension in [".parquet", ".pq", ".csv.gz", ".csv"]:
+            if path.endswith(extension):
+                base = path[:-len(extension)]
+                break
+        else:
+            raise ValueError(f"Catalog path must end in .parquet, .pq, .csv or .csv.gz, not {path}")
+
+        rows = [row for item in self.items for row in item.catalog_rows(apply_filter)]
+
+        # dataset keys first, then keys from the files, with the location of the file at the end
+        data_columns = list(dict.fromkeys(key for item in self.items for key in item.data))
+        file_columns = ["path", "root", "format_file"]
+        columns = data_columns + [key for key in dict.fromkeys(key for row in rows for key in row) if key not in data_columns and key not in file_columns] + file_columns
+
+        import pandas as pd
+        table = pd.DataFrame(rows, columns = columns)
+
+        if path.endswith((".parquet", ".pq")):
+            table.to_parquet(path, index = False, row_group_size = self.catalog_row_group_size)
+        else:
+            table.to_csv(path, index = False)
+
+        # folder mode format files (ending in a separator) are zarr stores
+        zarr = [item.format_file.endswith(os.sep) for item in self.items]
+        catalog = {
+            "esmcat_version": "0.1.0",
+            "id": name if name is not None else os.path.basename(base),
+            "description": description if description is not None else "Catalog written by dataset_finder",
+            "catalog_file": os.path.basename(path),
+            "attributes": [{"column_name": column, "vocabulary": ""} for column in columns if column != "path"],
+            "assets": {"column_name": "path", "format": "zarr" if zarr and all(zarr) else "netcdf"},
+            # the dataset keys, also written when there's no var column for the aggregation control (see load_catalog)
+            "dataset_finder": {"groupby_attrs": data_columns},
+        }
+        if "var" in columns:
+            aggregations = [{"type": "union", "attribute_name": "var"}]
+            if "start_year" in columns:
+                aggregations.append({"type": "join_existing", "attribute_name": "start_year", "options": {"dim": "time"}})
+            catalog["aggregation_control"] = {"variable_column_name": "var", "groupby_attrs": data_columns, "aggregations": aggregations}
+
+        json_path = base + ".json"
+        with open(json_path, "w") as fstream:
+            json.dump(catalog, fstream, indent = 2)
+        return json_path
+
     def includes(self, exact_match = False, **kwargs):
         return dataset_info_collection([item for item in self.items if item.includes(exact_match, **kwargs)])
 
     def condense(self, column, force_unique = True):
-        new_collection = dataset_info_collection()
-        for item in self.items:
-            if column in item.data:
-                item.data.pop(column)
-                item.refresh_info()
-                if force_unique:
-                    if column in item.get_info():
-                        item.prioritise(column)
-            if item.any_files():
-                for new_item in new_collection.items:
-                    if new_item.attempt_merge(item):
-                        break
-                else:
-                    new_collection.add(item)
-        return new_collection
+        """
+        Remove a column from the data of every item, merging items that are then identical into one (see _merge_datasets).
+        The files already found for each item are combined in memory, so nothing is searched again.
+        Inputs:
+        - column: The key to remove (e.g. "ver")
+        - force_unique: Whether files of the merged items which only differ by the column are clashes that have to be
+        resolved with select or prioritise, when the column is also in the file names (default True)
+        Returns:
+        A new dataset_info_collection of the merged items. Note the items are shared with this collection.
+        """
+        def condensed_items():
+            for item in self.items:
+                if column in item.data:
+                    item.data.pop(column)
+                    item.refresh_info()
+                    if force_unique:
+                        if column in item.get_info():
+                            item.prioritise(column)
+                if item.any_files():
+                    yield item
+
+        # the column is removed from the items' data below
+        self._index = None
+        return dataset_info_collection(list(_merge_datasets(condensed_items())))
+
+    def refresh(self):
+        """
+        Search again for the collection's datasets, keeping any selections and priorities made since, and report
+        what has changed. Directory listings are reused from the collection's directory_cache, so only directories
+        that have been modified since the last search are listed again (each directory is still checked).
+        If the collection was searched without a cache, an in-memory one is kept from now on, so the first
+        refresh lists everything but later ones don't.
+        Only collections made by filter_all, get_datasets or load_catalog (which loads the catalog again) can be refreshed.
+        Returns:
+        A refresh_report of the changes.
+        """
+        if self._search is None:
+            raise ValueError("Only collections made by filter_all, get_datasets or load_catalog can be refreshed")
+
+        function, arguments = self._search
+        if function is filter_all and arguments["cache"] is None:
+            arguments["cache"] = directory_cache()
+        if arguments.get("stats") is not None:
+            # the stats are kept for the latest search only
+            arguments["stats"] = scan_stats()
+
+        new_collection = function(**arguments)
+        report = _find_changes(self, new_collection)
+
+        self.items = new_collection.items
+        self.stats = new_collection.stats
+        self._index = None
+        return report
 
     # ~~so that open_mfdataset can be used directly with this object~~
     def __iter__(self):
@@ -863,10 +2238,102 @@ class dataset_info_collection:
     # display nicely when interrogating on JupyterLab
     def _repr_html_(self):
         # return tabulate([item.data | {key: merge_values(value) for key, value in item.get_info().items()} for item in self.items], headers = "keys", showindex = True, tablefmt = "html")
-        return tabulate([item.table_data() for item in self.items], headers = "keys", showindex = True, tablefmt = "unsafehtml")
+        if self.max_rows is None or len(self.items) <= self.max_rows:
+            return tabulate([item.table_data() for item in self.items], headers = "keys", showindex = True, tablefmt = "unsafehtml")
+
+        # the summaries of each row need the dataset's files, so they are only made for the rows shown
+        shown = max(1, self.max_rows)
+        head_count = (shown + 1) // 2
+        tail_count = shown // 2
+        head = [item.table_data() for item in self.items[:head_count]]
+        tail = [item.table_data() for item in self.items[len(self.items) - tail_count:]]
+        keys = dict.fromkeys(key for row in head + tail for key in row)
+        # the separator between the data and the summaries is a column of html
+        gap = {key: value if key.startswith("<th") else "..." for row in head + tail for key, value in row.items()}
+        gap = {key: gap[key] for key in keys}
+        index = [*range(head_count), "...", *range(len(self.items) - tail_count, len(self.items))]
+        table = tabulate(head + [gap] + tail, headers = "keys", showindex = index, tablefmt = "unsafehtml")
+        showing = f"the first {head_count} and last {tail_count}" if tail_count else f"the first {head_count}"
+        return table + f"\n<p>{len(self.items)} rows (showing {showing}, see dataset_info_collection.max_rows)</p>"
+
+
+class refresh_report:
+    """
+    The changes between two searches for the same datasets, from dataset_info_collection.refresh
+    or get_datasets(..., since = ...). Each attribute is a list:
+    - added: New datasets (dataset_info objects)
+    - removed: Datasets that weren't found again (dataset_info objects from the earlier search)
+    - added_files: New files within datasets found by both searches
+    - removed_files: Files within datasets found by both searches that weren't found again
+    - superseded: (old file, new file) tuples for files that were chosen before but have lost a clash to a
+    new file, such as a newer date_created (the new file is None if nothing replaced it in its clash group)
+    """
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.added_files = []
+        self.removed_files = []
+        self.superseded = []
+
+    def __repr__(self):
+        return tabulate([[name, len(getattr(self, name))] for name in ["added", "removed", "added_files", "removed_files", "superseded"]])
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.added_files or self.removed_files or self.superseded)
+
+
+def _find_changes(old_collection, new_collection):
+    """
+    Compare an earlier search with a new one for the same datasets. Selections and priorities made on the earlier
+    datasets since they were found are copied onto the matching new datasets first, so that they can be compared.
+    Returns:
+    A refresh_report of the changes.
+    """
+    old_items = {frozenset(item.data.items()): item for item in old_collection.items}
+    new_items = {frozenset(item.data.items()): item for item in new_collection.items}
+
+    report = refresh_report()
+    report.added = [item for key, item in new_items.items() if key not in old_items]
+    report.removed = [item for key, item in old_items.items() if key not in new_items]
+
+    for key, new_item in new_items.items():
+        if key not in old_items:
+            continue
+        old_item = old_items[key]
 
+        new_item.selected = old_item.selected.copy()
+        new_item.exact_match_dict = old_item.exact_match_dict.copy()
+        new_item.priority = {priority_key: {"default": options["default"], "preferences": list(options["preferences"])} for priority_key, options in old_item.priority.items()}
+        # keys deselected since the search need the files the search skipped
+        new_item.refresh_info(new_item._scan_terms_changed())
 
-def filter_all(format_dirs_list, format_files_list, unique = None, exact_match = False, **kwargs):
+        old_files = {file.replace(2 * os.sep, os.sep): info for info, file in old_item.get_generated_info(True)}
+        new_files = {file.replace(2 * os.sep, os.sep): info for info, file in new_item.get_generated_info(True)}
+        report.added_files += [file for file in new_files if file not in old_files]
+        report.removed_files += [file for file in old_files if file not in new_files]
+
+        if not new_item.priority:
+            continue
+
+        # the clash messages were already shown when the files were first chosen
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                old_chosen = old_item.get_files()
+                new_chosen = set(new_item.get_files())
+        except ValueError:
+            # unresolved clashes are raised when get_files is used
+            continue
+
+        # files that are still there but no longer chosen lost a clash, find the winner of the same clash group
+        def group(info):
+            return tuple(value for info_key, value in info.items() if info_key not in new_item.priority)
+        winners = {group(info): file for file, info in new_files.items() if file in new_chosen}
+        report.superseded += [(file, winners.get(group(new_files[file]))) for file in old_chosen if file not in new_chosen and file in new_files]
+
+    return report
+
+
+def filter_all(format_dirs_list, format_files_list, unique = None, exact_match = False, cache = None, threads = 8, workers = None, executor = None, stats = False, **kwargs):
     """
     Search through a directory and its subdirectories, filtering out results that do not match
     according to the given format strings and supplied variables, returning a list of applicable datasets.
@@ -887,6 +2354,15 @@ def filter_all(format_dirs_list, format_files_list, unique = None, exact_match =
     - exact_match: Whether to match search terms exactly, default to False. Otherwise a substring 
     is considered a match
     - unique: A dictionary of keys within datasets that should be unique, and the properties for resolving clashes
+    - cache: Whether to reuse directory listings from a directory_cache, only listing directories again if they
+    have been modified. Can be True (default on-disk cache), a path to a cache file, or a directory_cache object
+    - threads: The number of directories to list at the same time while searching (default 8)
+    - workers: If given, the search is split up by format_dirs and the directories at their first level, and the
+    pieces are searched in this many processes at the same time. The results are the same as without workers.
+    A cache kept only in memory isn't shared with the processes, so use an on-disk cache with workers
+    - executor: A concurrent.futures executor to search the pieces with instead of starting new processes
+    - stats: If True (default False), counts and timings of the search are kept in the returned collection's "stats",
+    and given to every dataset found as its "stats" (see scan_stats). Can also be an existing scan_stats to add to
     - **kwargs: Keyword arguments mapping search terms to values for matching. Multiple values can
     be assigned to each search term - only one needs to match for it to be included.
     Output:
@@ -900,103 +2376,610 @@ def filter_all(format_dirs_list, format_files_list, unique = None, exact_match =
     if isinstance(format_files_list, str):
         format_files_list = [format_files_list]
 
-    # internal helper function, can't be used from outside
-    # walk through directory tree to find datasets, filtering by matching names against columns along the way
-    def filter_walk(start_path, columns, exact_match = False, **kwargs):
-        for root, dirs, files in os.walk(start_path, followlinks = True):
-            dirs.sort()
-    
-            # how deep we are into the tree (root = 0)
-            level = 0
-            
-            if root != start_path:
-                level = root.replace(start_path, '').count(os.sep) + 1
-    
-            # stopping point - no more columns to check against
-            if level >= len(columns):
-                # yield turns this function into a generator instead of manually constructing
-                # and returning a list then looping through it later
-                # the code will resume from here when the next entry is required
-                yield root.replace(start_path, ''), dirs
-    
-                # stops the os.walk from travelling any deeper
-                dirs.clear()
-    
-            # match directory names against given filters to stop os.walk from finding unwanted datasets
-            else:
-                # if key wasn't provided, nothing will be filtered out
-                match_values(dirs, columns[level], kwargs, exact_match, in_place = True)
-                
-    all_data = dataset_info_collection()
+    cache = _get_cache(cache, "filter_all", format_dirs_list, format_files_list)
+    stats = _get_stats(stats)
 
-    for format_dirs in format_dirs_list:
+    all_data = dataset_info_collection(list(iter_filter_all(format_dirs_list, format_files_list, unique, exact_match, cache, threads,
+                                                            workers = workers, executor = executor, stats = stats, **kwargs)))
+    all_data.stats = stats
+    all_data._search = (filter_all, dict(format_dirs_list = format_dirs_list, format_files_list = format_files_list, unique = unique, exact_match = exact_match,
+                                         cache = cache, threads = threads, workers = workers, executor = executor, stats = stats, **kwargs))
 
-        # find root of string by looking for first variable
-        if "{" in format_dirs:
-            first_arg_pos = format_dirs.find("{")
-    
-            # cut off by folder in case the variable wasn't immediately after /
-            slash_pos = format_dirs[first_arg_pos::-1].find(os.sep)
-            if slash_pos == -1:
-                prev_separator_pos = -1
-            else:
-                prev_separator_pos = first_arg_pos - slash_pos
-    
-            start_path = format_dirs[:prev_separator_pos + 1]
-            columns = format_dirs[prev_separator_pos + 1:].split(os.sep)
-    
-            # remove empty final column which shows up from the split if path string ended in /
-            if not columns[-1]:
-                columns.pop()
-    
+    # all_data = all_data.select(exact_match = exact_match, **kwargs)
+
+    return all_data
+
+
+def iter_filter_all(format_dirs_list, format_files_list, unique = None, exact_match = False, cache = None, threads = 8, merge_roots = True, workers = None, executor = None, stats = False, stop = None, **kwargs):
+    """
+    Generator version of filter_all, which yields each dataset as soon as it is found instead of waiting for the
+    search to finish, so that files can start being opened while the rest of the search carries on.
+    A dataset found under several roots is only yielded once, the first time it is found. Roots found after that
+    are added to the dataset that was already yielded, so it is only guaranteed to include every root once the
+    generator has finished.
+    Inputs:
+    - format_dirs_list, format_files_list, unique, exact_match, cache, threads, workers, executor, stats, **kwargs: See filter_all.
+    The stats are given to every dataset yielded, and the total time includes any time spent between datasets
+    - merge_roots: Whether to merge datasets found under several roots (default True). This keeps every dataset
+    found so far in memory - if False, nothing is kept and the same dataset can be yielded once for each root
+    - stop: An optional threading.Event, once it is set the search finishes early without yielding anything more
+    Yields:
+    dataset_info objects, in the same order as filter_all.
+    """
+    if isinstance(format_dirs_list, str):
+        format_dirs_list = [format_dirs_list]
+
+    if isinstance(format_files_list, str):
+        format_files_list = [format_files_list]
+
+    cache = _get_cache(cache, "filter_all", format_dirs_list, format_files_list)
+    stats = _get_stats(stats)
+    start = time.perf_counter()
+
+    if workers is None and executor is None:
+        datasets = (dataset for format_dirs in format_dirs_list
+                    for dataset in _find_datasets(format_dirs, format_files_list, exact_match, cache, threads, kwargs, stop, stats = stats))
+    else:
+        datasets = _find_sharded_datasets(format_dirs_list, format_files_list, exact_match, cache, threads, kwargs, workers, executor, stats)
+
+    if merge_roots:
+        datasets = _merge_datasets(datasets)
+
+    try:
+        for dataset in datasets:
+            # the shards of a search in other processes can't be told to stop, so they are only left unread
+            if stop is not None and stop.is_set():
+                return
+            if unique:
+                for key, options in unique.items():
+                    dataset.prioritise(key, **options)
+            yield dataset
+
+    finally:
+        if cache is not None:
+            cache.flush()
+        if stats is not None:
+            stats.add_time("total", time.perf_counter() - start)
+
+
+def _split_format_dirs(format_dirs):
+    """
+    Split a format_dirs string into the fixed path leading up to its first variable, and the
+    directory levels (columns) after that point.
+    Returns:
+    A tuple of (start_path, columns).
+    """
+    # find root of string by looking for first variable
+    if "{" in format_dirs:
+        first_arg_pos = format_dirs.find("{")
+
+        # cut off by folder in case the variable wasn't immediately after /
+        slash_pos = format_dirs[first_arg_pos::-1].find(os.sep)
+        if slash_pos == -1:
+            prev_separator_pos = -1
         else:
-            start_path = format_dirs
-            columns = []
+            prev_separator_pos = first_arg_pos - slash_pos
+
+        start_path = format_dirs[:prev_separator_pos + 1]
+        columns = format_dirs[prev_separator_pos + 1:].split(os.sep)
+
+        # remove empty final column which shows up from the split if path string ended in /
+        if not columns[-1]:
+            columns.pop()
+
+    else:
+        start_path = format_dirs
+        columns = []
+
+    return start_path, columns
+
+
+def _find_datasets(format_dirs, format_files_list, exact_match, cache, threads, search_terms, stop = None, shard = None, stats = None):
+    """
+    Search a single format_dirs for datasets, yielding each one as soon as its files have been found and the
+    search terms have been selected. Datasets are not merged with each other here (see _collect_datasets).
+    Inputs:
+    - format_dirs: The format of the directories leading to the datasets
+    - format_files_list: A list of the formats of the files within the datasets
+    - exact_match: Whether to match search terms exactly
+    - cache: A directory_cache to list directories with, or None
+    - threads: The number of directories to list at the same time
+    - search_terms: A dictionary mapping search terms to values, as in filter_all's kwargs
+    - stop: An optional threading.Event, the search finishes early once it is set
+    - shard: The name of a single directory at the first level to search, skipping the others (see _list_shards)
+    - stats: A scan_stats to record the search in, or None
+    """
+    if stats is not None:
+        list_dir = functools.partial(_list_dir_with_stats, cache = cache, stats = stats)
+    else:
+        list_dir = cache.list_dir if cache is not None else _list_dir
+    start_path, columns = _split_format_dirs(format_dirs)
+
+    # once stopped, every directory is treated as unreadable so that the walk finishes straight away
+    def lister(path, dirs_only = False):
+        if stop is not None and stop.is_set():
+            return None
+        if shard is not None and path == start_path:
+            # already listed and counted by _list_shards
+            return cache.list_dir(path, dirs_only) if cache is not None else _list_dir(path, dirs_only)
+        return list_dir(path, dirs_only)
+
+    matcher = search_matcher(search_terms, exact_match)
+    # search terms that can't be used for the ranges of the formats are an error, rather than matching nothing
+    for format_string in [format_dirs, *format_files_list]:
+        for position, name in compile_format(format_string).fields:
+            if name.endswith("!start"):
+                matcher.check_range(name[:-len("!start")])
+
+    # match directory names against given filters at each level to stop the walk from finding unwanted datasets
+    # if key wasn't provided, nothing will be filtered out
+    def prune(level, dirs):
+        if level == 0 and shard is not None:
+            # the other directories at this level were pruned by _list_shards
+            dirs = [name for name in dirs if name == shard]
+        count = len(dirs)
+        with _timer(stats, "filtering"):
+            dirs = match_values(dirs, columns[level], matcher, in_place = True)
+        if stats is not None:
+            stats.add_pruned(columns[level], count - len(dirs))
+        return dirs
+
+    columns_pattern = compile_format(os.sep.join(columns))
+    first_format_file, first_levels, first_folder_mode = _split_format_file(format_files_list[0])
+
+    # a single pool of threads lists every directory of the search
+    with (concurrent.futures.ThreadPoolExecutor(threads) if threads > 1 else contextlib.nullcontext()) as executor:
+        roots = []
+        for root in _walk(start_path, columns, lister, prune = prune, executor = executor):
+            with _timer(stats, "matching"):
+                info = columns_pattern.match(root)
+            if info is not None:
+                roots.append((os.path.join(start_path, root) + os.sep, info))
+
+        # the datasets are walked in batches, listing each level of every dataset in a batch at the same time so
+        # that the threads are kept busy, while still yielding the first datasets before the whole search is done
+        batch_size = max(threads, 1) * 8
+        for batch_start in range(0, len(roots), batch_size):
+            if stop is not None and stop.is_set():
+                return
+            batch = roots[batch_start:batch_start + batch_size]
+
+            # every format file is tried against the same directories, so each directory is only listed once
+            listings = {}
+            def dataset_lister(path, dirs_only = False):
+                if path not in listings:
+                    listings[path] = lister(path)
+                return listings[path]
+
+            # directories within the datasets are also skipped if they can't match the search terms
+            # (every dataset of the format_dirs has the same keys in its data)
+            scan_terms = {key: (values, exact_match) for key, values in search_terms.items() if key not in batch[0][1]}
+            file_prune = _scan_pruner(scan_terms, first_levels, stats) if scan_terms else None
+
+            # most datasets use the first format file, so it's walked for the whole batch together
+            walked = {dataset_root: [] for dataset_root, info in batch}
+            for dataset_root, relative, names in _walk_roots(list(walked), first_levels, dataset_lister, prune = file_prune,
+                                                             final = "dirs" if first_folder_mode else "files", executor = executor):
+                walked[dataset_root].append((relative, names))
+
+            for dataset_root, info in batch:
+                if stop is not None and stop.is_set():
+                    return
+                yield from _found_datasets(dataset_root, info, format_files_list, exact_match, cache, threads, search_terms, stats,
+                                           dataset_lister, walked, executor, columns)
+
+
+def _found_datasets(dataset_root, info, format_files_list, exact_match, cache, threads, search_terms, stats, lister, walked, executor, columns):
+    """
+    Make the dataset found at a directory of _find_datasets, trying each format file in turn, and select the search
+    terms within it. Yields the dataset if it has any files in the selection.
+    The directories of the first format file have already been walked (see dataset_info.scan_files).
+    """
+    for position, format_file in enumerate(format_files_list):
+        dataset = dataset_info(info, dataset_root, format_file, cache, threads)
+        dataset.stats = stats
+
+        # directories within the dataset are also skipped if they can't match the search terms
+        # (copied, as they are compared with the selection later on)
+        scan_terms = {key: (copy.copy(values), exact_match) for key, values in search_terms.items() if key not in info}
+        dataset._scan_terms = scan_terms
         
+        try:
+            # the files are found here, everything after this (including merges) reuses them
+            dataset.scan_files(lister, walked if position == 0 else None, executor)
+            if scan_terms and position < len(format_files_list) - 1 and not dataset.any_files():
+                # the next format file is only tried if this one has no files at all, search terms or not
+                dataset._scan_terms = scan_terms = {}
+                dataset.refresh_info(True)
+                dataset.scan_files(lister, executor = executor)
+            with _timer(stats, "collating"):
+                dataset.get_info()
+        except Exception as e:
+            print(e, info, dataset_root, columns)
+            # raise e
+            continue
+
+        if dataset.any_files():
+            with _timer(stats, "filtering"):
+                # the walk was limited to the search terms being selected here
+                dataset._scan_terms = {}
+                for key in search_terms:
+                    if key not in dataset.data and key in dataset.info:
+                        dataset = dataset.select(**{key: search_terms[key]}, exact_match = exact_match)
+                dataset._scan_terms = {key: terms for key, terms in scan_terms.items() if key in dataset.selected}
+
+                # check there are still files after selection
+                found = dataset.any_files()
+
+            if found:
+                if stats is not None:
+                    stats.add(files_yielded = sum(len(rows) for table, rows in dataset.get_rows(True)))
+                yield dataset
             
-        for root, dirs in filter_walk(start_path, columns, exact_match, **kwargs):
-            info = extract_from_format(os.sep.join(columns), root)
-            # if not info:
-            #     info = {"path": format_dirs}
-
-            for format_file in format_files_list:
-                # print(start_path, root)
-                # print(format_dirs.format(**info))
-                # raise Exception("e")
-                # dataset = dataset_info(info, format_dirs.format(**info), format_file)
-                dataset = dataset_info(info, os.path.join(start_path, root) + os.sep, format_file)
-                
-                try:
-                    dataset.get_info()
-                except Exception as e:
-                    print(e, info, root, columns)
-                    # raise e
-                    continue
+            return
 
-                if dataset.any_files():
-                    for key in kwargs:
-                        if key not in dataset.data and key in dataset.info:
-                            dataset = dataset.select(**{key: kwargs[key]}, exact_match = exact_match)
 
-                    # check there are still files after selection
-                    if dataset.any_files(): 
-                        for item in all_data.items:
-                            if item.attempt_merge(dataset):
-                                break
-                        else:
-                            all_data.add(dataset)
-                    
-                    break
+def _list_shards(format_dirs, exact_match, cache, search_terms, stats = None):
+    """
+    Split the search of a format_dirs into pieces that can be run separately, one for each directory at the first
+    level of the template that matches the search terms.
+    The listing and pruning of the first level are recorded in stats (if given) here rather than by each shard,
+    so the stats are the same as searching without shards.
+    Returns:
+    A list of directory names to pass to _find_datasets as its shard, or [None] if the format_dirs has no levels.
+    """
+    start_path, columns = _split_format_dirs(format_dirs)
+    if not columns:
+        return [None]
+
+    if stats is not None:
+        listing = _list_dir_with_stats(start_path, True, cache, stats)
+    else:
+        listing = cache.list_dir(start_path, True) if cache is not None else _list_dir(start_path, True)
+    if listing is None:
+        return []
+
+    dirs = list(listing[0])
+    with _timer(stats, "filtering"):
+        shards = match_values(dirs, columns[0], search_terms, exact_match, in_place = False)
+    if stats is not None:
+        stats.add_pruned(columns[0], len(dirs) - len(shards))
+    return shards
+
+
+def _scan_shard(format_dirs, format_files_list, exact_match, cache, threads, search_terms, shard, stats = False):
+    """
+    Search a single shard of a format_dirs (see _list_shards). This is run in worker processes by iter_filter_all,
+    so everything is passed in and out by pickling.
+    Returns:
+    A tuple of the list of dataset_info objects found, without their cache or stats (which the caller should set
+    again), and a scan_stats of the shard's search if stats is True (otherwise None).
+    """
+    shard_stats = scan_stats() if stats else None
+    try:
+        datasets = list(_find_datasets(format_dirs, format_files_list, exact_match, cache, threads, search_terms, shard = shard, stats = shard_stats))
+    finally:
+        if cache is not None:
+            cache.flush()
+
+    for dataset in datasets:
+        dataset.cache = None
+        dataset.stats = None
+    return datasets, shard_stats
+
+
+def _find_sharded_datasets(format_dirs_list, format_files_list, exact_match, cache, threads, search_terms, workers = None, executor = None, stats = None):
+    """
+    Search every format_dirs split into shards (see _list_shards) on an executor, yielding the datasets in the
+    same order _find_datasets would have found them in, regardless of which shard finishes first.
+    If no executor is given, a ProcessPoolExecutor with the given number of workers is used.
+    If given a scan_stats, the stats of every shard are added to it.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+
+    try:
+        futures = []
+        for format_dirs in format_dirs_list:
+            for shard in _list_shards(format_dirs, exact_match, cache, search_terms, stats):
+                futures.append(executor.submit(_scan_shard, format_dirs, format_files_list, exact_match, cache, threads, search_terms, shard, stats is not None))
+
+        # shards are in sorted order, so joining their results in order gives the same order as a single search
+        for future in futures:
+            datasets, shard_stats = future.result()
+            if stats is not None:
+                stats.merge(shard_stats)
+            for dataset in datasets:
+                dataset.cache = cache
+                dataset.stats = stats
+                yield dataset
+
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures = True)
+
+
+def _merge_datasets(datasets):
+    """
+    Merge datasets with identical data, so that a dataset found under several roots is a single entry.
+    Each dataset is yielded the first time its data is seen, and the roots of any later datasets with the
+    same data are added to it.
+    Inputs:
+    - datasets: An iterable of dataset_info objects
+    Yields:
+    dataset_info objects with unique data, in the order they were first seen.
+    """
+    # data values are strings, so the frozen items can be used as a key (equal to comparing with attempt_merge)
+    found = {}
+    for dataset in datasets:
+        data = frozenset(dataset.data.items())
+        if data in found:
+            found[data].attempt_merge(dataset)
+        else:
+            found[data] = dataset
+            yield dataset
+
+
+def _collect_datasets(datasets, unique = None):
+    """
+    Gather datasets into a dataset_info_collection, merging any with identical data (see _merge_datasets).
+    Inputs:
+    - datasets: An iterable of dataset_info objects, in the order they should appear
+    - unique: A dictionary of keys that should be unique, and the properties for resolving clashes (see filter_all)
+    Returns:
+    A dataset_info_collection object.
+    """
+    all_data = dataset_info_collection(list(_merge_datasets(datasets)))
 
     if unique:
         for key, options in unique.items():
             all_data.prioritise(key, **options)
 
-    # all_data = all_data.select(exact_match = exact_match, **kwargs)
+    return all_data
 
+
+def _catalog_paths(catalog):
+    """
+    Get the table and JSON paths of a catalog written by dataset_info_collection.to_intake_esm, given either one.
+    """
+    for extension in [".json", ".parquet", ".pq", ".csv.gz", ".csv"]:
+        if catalog.endswith(extension):
+            base = catalog[:-len(extension)]
+            break
+    else:
+        raise ValueError(f"Catalog path must end in .json, .parquet, .pq, .csv or .csv.gz, not {catalog}")
+
+    json_path = base + ".json"
+    with open(json_path, "r") as fstream:
+        description = json.load(fstream)
+
+    if catalog == json_path:
+        catalog = os.path.join(os.path.dirname(json_path), description["catalog_file"])
+    return catalog, description
+
+
+def _read_catalog(path, exact_match = False, search_terms = {}):
+    """
+    Read the rows of a catalog table that could match the given search terms.
+    Search terms are worked out against each distinct value of their column using the same matching as filter_all,
+    and pushed down to the read as a filter on the matching values (as well as missing values, which filter_all
+    wouldn't have filtered on). For Parquet this means pyarrow only reads row groups that could have matching rows.
+    Range search terms (e.g. year) are pushed down on the start_{key} and end_{key} columns, and may let through
+    a few extra rows that are removed later by selection.
+    Inputs:
+    - path: The Parquet or CSV catalog table
+    - exact_match: Whether to match search terms exactly
+    - search_terms: A dictionary mapping search terms to values, as in filter_all's kwargs
+    Returns:
+    A tuple of (the column names, a list of tuples of values for each row read), with None for missing values.
+    """
+    matcher = search_matcher(search_terms, exact_match)
+
+    def matching(key, distinct):
+        return [value for value in distinct if value is not None and value != "" and matcher.match({key: value})]
+
+    def overlapping(key, starts, ends):
+        # any interval overlapping one of the search intervals starts before the last search end
+        # and ends after the first search start
+        intervals = matcher.ranges[key]
+        if not intervals:
+            return [], []
+        first_start = min(interval.start for interval in intervals)
+        last_end = max(interval.end for interval in intervals)
+        keep_starts = [value for value in starts if value and value.isdigit() and int(value) <= last_end]
+        keep_ends = [value for value in ends if value and value.isdigit() and int(value) >= first_start]
+        return keep_starts, keep_ends
+
+    if path.endswith((".parquet", ".pq")):
+        # only needed for Parquet catalogs
+        import pyarrow
+        import pyarrow.dataset as pads
+
+        # values repeat a lot, so reading them dictionary encoded is much faster (paths are all different)
+        plain_dataset = pads.dataset(path, format = "parquet")
+        schema = plain_dataset.schema
+        read_options = pads.ParquetReadOptions(dictionary_columns = [name for name in schema.names if name != "path"])
+        file_format = pads.ParquetFileFormat(read_options = read_options)
+        dataset = pads.dataset(path, format = file_format)
+        columns = schema.names
+
+        filter_columns = {}
+        for key in search_terms:
+            if key in columns:
+                filter_columns[key] = [key]
+            elif f"start_{key}" in columns and f"end_{key}" in columns:
+                filter_columns[key] = [f"start_{key}", f"end_{key}"]
+
+        # distinct values of every column being searched, read in one go
+        needed = [column for key_columns in filter_columns.values() for column in key_columns]
+        distinct_table = dataset.to_table(columns = needed) if needed else None
+        def distinct(column):
+            return distinct_table.column(column).unique().cast(schema.field(column).type).to_pylist()
+
+        def column_filter(column, values):
+            field = pads.field(column)
+            if len(values) == 1:
+                return (field == values[0]) | field.is_null()
+            return field.isin(pyarrow.array(values, type = schema.field(column).type)) | field.is_null()
+
+        expression = None
+        for key, key_columns in filter_columns.items():
+            if len(key_columns) == 1:
+                key_filters = [column_filter(key, matching(key, distinct(key)))]
+            else:
+                keep_starts, keep_ends = overlapping(key, distinct(key_columns[0]), distinct(key_columns[1]))
+                key_filters = [column_filter(key_columns[0], keep_starts), column_filter(key_columns[1], keep_ends)]
+            for key_filter in key_filters:
+                expression = key_filter if expression is None else expression & key_filter
+
+        if expression is not None:
+            # row group statistics can't be used when reading dictionary encoded, so the row groups that could
+            # have matching rows are found first and only those are read
+            fragments = []
+            for fragment in plain_dataset.get_fragments():
+                row_groups = [row_group.id for row_group in fragment.subset(filter = expression).row_groups]
+                fragments.append(file_format.make_fragment(fragment.path, fragment.filesystem, row_groups = row_groups))
+            dataset = pads.FileSystemDataset(fragments, dataset.schema, file_format, plain_dataset.filesystem)
+
+        table = dataset.to_table(filter = expression).cast(schema).to_pydict()
+        rows = list(zip(*table.values()))
+
+    else:
+        import pandas as pd
+
+        table = pd.read_csv(path, dtype = str, keep_default_na = False)
+        columns = list(table.columns)
+
+        for key in search_terms:
+            if key in columns:
+                keep = matching(key, table[key].unique())
+                table = table[table[key].isin(keep) | (table[key] == "")]
+            elif f"start_{key}" in columns and f"end_{key}" in columns:
+                keep_starts, keep_ends = overlapping(key, table[f"start_{key}"].unique(), table[f"end_{key}"].unique())
+                table = table[(table[f"start_{key}"].isin(keep_starts) | (table[f"start_{key}"] == "")) & (table[f"end_{key}"].isin(keep_ends) | (table[f"end_{key}"] == ""))]
+
+        # CSV can't tell an empty value from a missing one, empty values are treated as missing
+        rows = list(table.replace("", None).itertuples(index = False, name = None))
+
+    return columns, rows
+
+
+def load_catalog(catalog, unique = None, exact_match = False, format_dirs_list = None, **kwargs):
+    """
+    Load datasets from a catalog written by dataset_info_collection.to_intake_esm instead of searching through
+    the directories. The datasets are the same as filter_all would have found when the catalog was written,
+    and selection, priorities and clashes work the same way. Search terms are pushed down to the read (see
+    _read_catalog), so only the parts of the catalog that are needed are read.
+    Inputs:
+    - catalog: The path of the catalog's table (Parquet or CSV) or its JSON file
+    - unique: A dictionary of keys within datasets that should be unique, and the properties for resolving clashes
+    - exact_match: Whether to match search terms exactly, default to False. Otherwise a substring 
+    is considered a match
+    - format_dirs_list: The format_dirs the catalog was searched with. If given, datasets are put in the same order
+    filter_all would find them in with these search terms, otherwise they are in the order they were written in
+    - **kwargs: Keyword arguments mapping search terms to values for matching, as in filter_all
+    Output:
+    A dataset_info_collection object containing a list of dataset_info objects corresponding to
+    successful matches.
+    Note that only the files matching the search terms are read, so selecting other files afterwards
+    (e.g. a different var) won't find them - load the catalog again with the new search terms instead.
+    """
+    path, description = _catalog_paths(catalog)
+    columns, rows = _read_catalog(path, exact_match, kwargs)
+    position = {column: i for i, column in enumerate(columns)}
+
+    if "dataset_finder" in description:
+        data_columns = description["dataset_finder"]["groupby_attrs"]
+    elif "aggregation_control" in description:
+        data_columns = description["aggregation_control"]["groupby_attrs"]
+    elif format_dirs_list is not None:
+        # catalogs written before the dataset keys were always kept, without a var column: the dataset keys are
+        # the values in the format_dirs
+        dirs_fields = {name for format_dirs in ([format_dirs_list] if isinstance(format_dirs_list, str) else format_dirs_list)
+                       for group, name in compile_format(os.sep.join(_split_format_dirs(format_dirs)[1])).fields}
+        data_columns = [column for column in columns if column in dirs_fields]
+    else:
+        # as above without the format_dirs: the columns that aren't extracted from the files (see to_intake_esm), and
+        # those that are but only have one value under each root (as the values of the dataset keys come from the root)
+        file_columns = {"_".join(name.split("!")[::-1]) for format_file in dict.fromkeys(row[position["format_file"]] for row in rows)
+                        for group, name in compile_format(format_file).fields}
+        root_values = {}
+        for row in rows:
+            for column in file_columns & position.keys():
+                root_values.setdefault((row[position["root"]], column), set()).add(row[position[column]])
+        varying = {column for (root, column), values in root_values.items() if len(values) > 1}
+        data_columns = [attribute["column_name"] for attribute in description["attributes"]
+                        if attribute["column_name"] not in ["root", "format_file"] and attribute["column_name"] not in varying]
+
+    data_positions = [(key, position[key]) for key in data_columns if key in position]
+    root_position, path_position, format_position = position["root"], position["path"], position["format_file"]
+
+    # (value name, column position) pairs in the order they appear in each format file
+    # ranges are written as start_{key} and end_{key} (see dataset_info.catalog_rows)
+    format_positions = {}
+
+    # rebuild the datasets from their rows, keeping the order they were written in
+    datasets = {}
+    for row in rows:
+        data = {key: row[i] for key, i in data_positions if row[i] is not None}
+        root, format_file = row[root_position], row[format_position]
+
+        dataset_key = frozenset(data.items())
+        if dataset_key not in datasets:
+            datasets[dataset_key] = dataset_info(data, root, format_file)
+            datasets[dataset_key].roots = []
+        dataset = datasets[dataset_key]
+
+        if root not in dataset._file_tables:
+            dataset.roots.append(root)
+            # the paths in a catalog are already complete, so the table's root is left empty
+            dataset._file_tables[root] = file_table()
+
+        if format_file not in format_positions:
+            names = dict.fromkeys(name for group, name in compile_format(format_file).fields)
+            format_positions[format_file] = [(name, position["_".join(name.split("!")[::-1])]) for name in names if "_".join(name.split("!")[::-1]) in position]
+
+        # values are put back in the order they appear in the format file, under their original names
+        extracted_values = {name: row[i] for name, i in format_positions[format_file] if row[i] is not None}
+        directory, file = os.path.split(row[path_position])
+        dataset._file_tables[root].append(extracted_values, os.path.join(directory, ""), file)
+
+    if format_dirs_list is not None:
+        if isinstance(format_dirs_list, str):
+            format_dirs_list = [format_dirs_list]
+        splits = [_split_format_dirs(format_dirs) for format_dirs in format_dirs_list]
+        patterns = [compile_format(os.sep.join(columns)) for start_path, columns in splits]
+
+        # the order filter_all walks roots in: by format_dirs, then sorted by directory
+        def root_order(root):
+            for position, ((start_path, columns), pattern) in enumerate(zip(splits, patterns)):
+                if root.startswith(start_path):
+                    relative = root[len(start_path):].rstrip(os.sep)
+                    if pattern.match(relative) is not None:
+                        return position, relative.split(os.sep)
+            return len(splits), [root]
+
+        for dataset in datasets.values():
+            dataset.roots.sort(key = root_order)
+        datasets = {key: datasets[key] for key in sorted(datasets, key = lambda key: root_order(datasets[key].roots[0]))}
+
+    def selected_datasets():
+        for dataset in datasets.values():
+            # the same selection filter_all makes after finding a dataset
+            # (every file has the same keys, so the keys in its info are the ones in the format file)
+            info_keys = {name.split("!")[0] for name, i in format_positions[dataset.format_file]}
+            for key in kwargs:
+                if key not in dataset.data and key in info_keys:
+                    dataset = dataset.select(**{key: kwargs[key]}, exact_match = exact_match)
+            if dataset.any_files():
+                yield dataset
+
+    all_data = _collect_datasets(selected_datasets(), unique)
+    all_data._search = (load_catalog, dict(catalog = catalog, unique = unique, exact_match = exact_match, format_dirs_list = format_dirs_list, **kwargs))
     return all_data
 
-    
+
 def merge_values(values):
     """
     Merge a list of strings into a single nice string.
@@ -1006,11 +2989,15 @@ def merge_values(values):
     If there are multiple non-continuous groups of integers, they will be comma separated.
     Example: If values = ["1960", "1961", "1962", "1963", "1964", "1970", "1971", "1972"],
     then the output will be "1960 to 1964, 1970 to 1972".
+    A list of year_interval objects is merged in the same way.
     Inputs:
-    - values: the list of strings to merge
+    - values: the list of strings (or year_interval objects) to merge
     Output:
     A single string joining the values as specified.
     """
+    if values and all(isinstance(item, year_interval) for item in values):
+        return ", ".join(str(interval) for interval in _merge_intervals(values))
+
     if all([item.isdigit() for item in values]):
         numbers = sorted([int(value) for value in values])
         start_number = numbers.pop(0)
@@ -1038,12 +3025,121 @@ def merge_values(values):
     return ", ".join(values)
 
 
+class year_interval:
+    """
+    An inclusive range of years, stored as two integers so that ranges can be compared directly instead of
+    building and searching lists of year strings. Any other {name!start} / {name!end} pair in a format
+    (such as months) is also stored as one of these.
+    For compatibility with the lists of year strings that were previously used, iterating gives each year as a
+    string, and "in" accepts a year (string or integer) or another year_interval (which must be entirely inside).
+    Inputs:
+    - start: The first year, as an integer or string
+    - end: The last year (included), as an integer or string. If not given, the interval is just the start year
+    """
+    __slots__ = ("start", "end")
+
+    def __init__(self, start, end = None):
+        self.start = int(start)
+        self.end = self.start if end is None else int(end)
+
+    def __repr__(self):
+        return f"year_interval({self.start}, {self.end})"
+
+    def __str__(self):
+        if self.start == self.end:
+            return f"{self.start}"
+        return f"{self.start} to {self.end}"
+
+    def __eq__(self, other):
+        return isinstance(other, year_interval) and self.start == other.start and self.end == other.end
+
+    def __lt__(self, other):
+        return (self.start, self.end) < (other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __len__(self):
+        return max(0, self.end - self.start + 1)
+
+    def __iter__(self):
+        return (str(year) for year in range(self.start, self.end + 1))
+
+    def __contains__(self, value):
+        if isinstance(value, year_interval):
+            return self.start <= value.start and value.end <= self.end
+        try:
+            return self.start <= int(value) <= self.end
+        except (TypeError, ValueError):
+            return False
+
+    def overlaps(self, other):
+        """
+        Check whether any year is in both this and another year_interval.
+        """
+        return max(self.start, other.start) <= min(self.end, other.end)
+
+
+def _is_interval_tuple(value):
+    # (start, end) pair of integers, as in select(year = (1980, 2010))
+    return isinstance(value, tuple) and len(value) == 2 and all(isinstance(item, int) and not isinstance(item, bool) for item in value)
+
+
+def _to_interval(value):
+    """
+    Turn a single search value for a range (year_interval, (start, end) tuple or single year) into a year_interval.
+    Raises ValueError or TypeError if it can't be converted.
+    """
+    if isinstance(value, year_interval):
+        return value
+    if _is_interval_tuple(value):
+        return year_interval(*value)
+    return year_interval(value)
+
+
+def _to_intervals(values):
+    """
+    Turn the search values given for a range into a list of year_interval objects.
+    Accepts a year_interval, a (start, end) tuple of integers, a single year, or a list of any of these
+    (such as the list of year strings year_range returns). Values that aren't years are left out.
+    """
+    if isinstance(values, (str, int, year_interval)) or _is_interval_tuple(values):
+        values = [values]
+    intervals = []
+    try:
+        for value in values:
+            try:
+                intervals.append(_to_interval(value))
+            except (TypeError, ValueError):
+                pass
+    except TypeError:
+        pass
+    return intervals
+
+
+def _merge_intervals(intervals):
+    """
+    Merge a list of year_interval objects into the smallest sorted list of intervals covering the same years.
+    Overlapping and consecutive intervals (e.g. 1960 to 1964 and 1965 to 1969) are joined together.
+    """
+    merged = []
+    for interval in sorted(interval for interval in intervals if interval.start <= interval.end):
+        if merged and interval.start <= merged[-1].end + 1:
+            if interval.end > merged[-1].end:
+                merged[-1] = year_interval(merged[-1].start, interval.end)
+        else:
+            merged.append(interval)
+    return merged
+
+
 def year_range(start = None, end = None, step: int = 1, inclusive: bool = True):
     """
-    Generates a list of year strings from between "start" and "end" for the purposes of string matching.
+    Generates a list of year strings from between "start" and "end" for the purposes of matching.
     In general, matches the output of range(start, end, step), but will behave slightly differently
     if only one input is given (it will be treated as the start instead of the end.
     Also, defaults to including the end point which range() does not.
+    Consecutive years are matched as a single interval, so long ranges are as quick to match as a year_interval
+    or a (start, end) tuple of integers, which can also be used directly when selecting, e.g. select(year = (1980, 2010)).
     Inputs:
     - start: int representing start year. If not specified or None, defaults to 1800. Will attempt to convert if not type int
     - end: int representing end year. If not specified or None, defaults to 2200. Will attempt to convert if not type int
@@ -1052,49 +3148,173 @@ def year_range(start = None, end = None, step: int = 1, inclusive: bool = True):
     Outputs:
     A list of strings according to the given parameters.
     """
-
-    start = int(start)
-    end = int(end)
     
     # default values, though there's probably a better solution here (with slices or maybe regexps up the line)
     if start is None:
         start = 1800
     if end is None:
         end = 2200
-        
-    return [str(year) for year in range(start, end + 1 if inclusive else 0, step)]
+
+    start = int(start)
+    end = int(end) if inclusive else int(end) - 1
+
+    return [str(year) for year in range(start, end + 1, step)]
 
 
-def paths(key, yaml_path = "paths.yml"):
+# paths yaml files already read, as {path: ((modification time, size), keys)}, so that a file is only parsed
+# again if it has changed
+_paths_files = {}
+
+def _read_paths_file(yaml_path = "paths.yml"):
     """
-    Use a yaml file to record paths in advance and load them by key.
-    Return a function that calls filter_all with the appropriate paths.
-    Inputs:
-    - key: The name of the paths being referenced within the yaml file
-    - yaml_path: The path of the yaml file (default "paths.yml" in working directory)
+    Read a paths yaml file, reusing the result of an earlier read if the file hasn't changed since.
+    A relative yaml_path is taken to be next to this file.
     Returns:
-    A function calling filter_all with the file path arguments already assigned    
+    A dictionary mapping each key in the file to its entry. It is shared between reads, so shouldn't be changed.
     """
     if yaml_path[0] != os.sep:
         yaml_path = os.path.join(os.path.dirname(__file__), yaml_path)
-        
+
+    status = os.stat(yaml_path)
+    version = (status.st_mtime_ns, status.st_size)
+    if yaml_path in _paths_files and _paths_files[yaml_path][0] == version:
+        return _paths_files[yaml_path][1]
+
+    import yaml
+
     with open(yaml_path, 'r') as fstream:
         keys = yaml.safe_load(fstream)
+    _paths_files[yaml_path] = (version, keys)
+    return keys
+
+
+def _load_paths(key, yaml_path = "paths.yml"):
+    """
+    Read an entry of the paths yaml file.
+    Returns:
+    A tuple of (format_dirs, format_file, unique), where unique is None if the entry doesn't have it.
+    """
+    keys = _read_paths_file(yaml_path)
 
-    format_dirs = keys[key]["format_dirs"]
-    format_file = keys[key]["format_file"]
+    # copied so that changes made to them later don't change the next read
+    format_dirs = copy.deepcopy(keys[key]["format_dirs"])
+    format_file = copy.deepcopy(keys[key]["format_file"])
     if "unique" in keys[key]:
-        unique = keys[key]["unique"]
+        unique = copy.deepcopy(keys[key]["unique"])
     else:
         unique = None
 
+    return format_dirs, format_file, unique
+
+
+def _compile_paths(format_dirs_list, format_files_list):
+    """
+    Compile every format used when searching the given paths (see compile_format), so that any mistakes in them
+    are found before searching. Raises ValueError if a format can't be compiled.
+    """
+    if isinstance(format_dirs_list, str):
+        format_dirs_list = [format_dirs_list]
+    if isinstance(format_files_list, str):
+        format_files_list = [format_files_list]
+
+    for format_dirs in format_dirs_list:
+        start_path, columns = _split_format_dirs(format_dirs)
+        compile_format(os.sep.join(columns))
+        for column in columns:
+            compile_format(column)
+
+    # as in dataset_info.scan_files
+    for format_file in format_files_list:
+        if format_file[0] == os.sep:
+            format_file = format_file[1:]
+        if format_file and format_file[-1] == os.sep:
+            format_file = format_file[:-1]
+        compile_format(format_file)
+        for level in format_file.split(os.sep)[:-1]:
+            compile_format(level)
+
+
+def _check_paths_entry(key, entry):
+    """
+    Check that an entry of a paths yaml file has everything needed to search it, and compile its formats.
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(entry, dict) or "format_dirs" not in entry or "format_file" not in entry:
+        raise ValueError(f'Paths entry "{key}" needs both format_dirs and format_file')
+
+    for name in ["format_dirs", "format_file"]:
+        values = [entry[name]] if isinstance(entry[name], str) else entry[name]
+        if not isinstance(values, list) or not values or not all(isinstance(value, str) and value for value in values):
+            raise ValueError(f'{name} of paths entry "{key}" should be a path or a list of paths')
+
+    unique = entry.get("unique")
+    if unique is not None:
+        if not isinstance(unique, dict):
+            raise ValueError(f'unique of paths entry "{key}" should map keys to their default and preferences')
+        for unique_key, options in unique.items():
+            if not isinstance(options, dict) or set(options) - {"default", "preferences"}:
+                raise ValueError(f'unique {unique_key} of paths entry "{key}" should only have a default and preferences')
+            if options.get("default") not in [None, "high", "low", "error"]:
+                raise ValueError(f'Unknown default "{options["default"]}" for unique {unique_key} of paths entry "{key}" (should be high, low or error)')
+            if not isinstance(options.get("preferences", []), (str, list)):
+                raise ValueError(f'preferences for unique {unique_key} of paths entry "{key}" should be a list')
+
+    try:
+        _compile_paths(entry["format_dirs"], entry["format_file"])
+    except ValueError as e:
+        raise ValueError(f'Paths entry "{key}": {e}') from e
+
+
+def _use_paths(format_dirs, format_file, unique, cache, threads, workers, executor, catalog, stats):
+    # the function returned by paths (and finder.paths)
     def use_paths(exact_match = False, **kwargs):
-        return filter_all(format_dirs, format_file, unique, exact_match, **kwargs)
+        if catalog is not None:
+            return load_catalog(catalog, unique, exact_match, format_dirs, **kwargs)
+        return filter_all(format_dirs, format_file, unique, exact_match, cache, threads, workers, executor, stats, **kwargs)
 
     return use_paths
 
 
-def get_datasets(key, yaml_path = "paths.yml", exact_match = False, **kwargs):
+def _since(since, cache):
+    """
+    Work out the earlier collection (if any) and the cache to search with from the "since" argument of get_datasets.
+    Returns:
+    A tuple of (previous collection or None, cache).
+    """
+    previous = None
+    if isinstance(since, dataset_info_collection):
+        previous = since
+        if previous._search is not None and previous._search[1].get("cache") is not None:
+            cache = previous._search[1]["cache"]
+    elif since is not None:
+        cache = since
+    return previous, cache
+
+
+def paths(key, yaml_path = "paths.yml", cache = False, threads = 8, workers = None, executor = None, catalog = None, stats = False):
+    """
+    Use a yaml file to record paths in advance and load them by key.
+    Return a function that calls filter_all with the appropriate paths.
+    Inputs:
+    - key: The name of the paths being referenced within the yaml file
+    - yaml_path: The path of the yaml file (default "paths.yml" in working directory)
+    - cache: Whether to keep directory listings in a directory_cache (see filter_all). If True,
+    the cache is stored in the user's cache directory under the key name
+    - threads: The number of directories to list at the same time while searching (default 8)
+    - workers: The number of processes to split the search between (see filter_all)
+    - executor: A concurrent.futures executor to split the search between instead (see filter_all)
+    - catalog: A catalog written by dataset_info_collection.to_intake_esm to load the datasets from instead
+    of searching (see load_catalog)
+    - stats: Whether to keep counts and timings of each search in the returned collection (see filter_all)
+    Returns:
+    A function calling filter_all with the file path arguments already assigned    
+    """
+    format_dirs, format_file, unique = _load_paths(key, yaml_path)
+    cache = _get_cache(cache, key, format_dirs, format_file)
+    return _use_paths(format_dirs, format_file, unique, cache, threads, workers, executor, catalog, stats)
+
+
+def get_datasets(key, yaml_path = "paths.yml", exact_match = False, cache = False, threads = 8, workers = None, executor = None, catalog = None, since = None, stats = False, server = None, **kwargs):
     """
     Use a yaml file to get path formats, then immediately search and return dataset matches.
     Identical to "paths" above except removes an intermediate step. See filter_all for more.
@@ -1103,11 +3323,757 @@ def get_datasets(key, yaml_path = "paths.yml", exact_match = False, **kwargs):
     - yaml_path: The path of the yaml file (default "paths.yml" in working directory)
     - exact_match: Whether to match search terms exactly, default to False. Otherwise a substring 
     is considered a match
+    - cache: If True, directory listings are kept in an on-disk cache and only directories that have been
+    modified since the last search are listed again. Can also be a path to a cache file or a directory_cache
+    - threads: The number of directories to list at the same time while searching (default 8)
+    - workers: If given, the search is split between this many processes, e.g. to use every core of a compute
+    node for the GCM paths (see filter_all)
+    - executor: A concurrent.futures executor to split the search between instead (see filter_all)
+    - catalog: A catalog written by dataset_info_collection.to_intake_esm (e.g. a nightly export) to load the
+    datasets from instead of searching through the directories (see load_catalog)
+    - since: An earlier collection from the same search, or a directory_cache. Listings are reused from the
+    collection's cache (or the given cache), so only directories modified since are listed again. If given a
+    collection, the changes since it are kept in the returned collection's "changes" (see refresh_report)
+    - stats: Whether to keep counts and timings of the search (see filter_all). Not used when loading from a catalog
+    - server: The socket of a dataset_server to ask for the datasets before searching, which answers from the
+    datasets it keeps in memory (see dataset_server). If None, the DATASET_FINDER_SOCKET environment variable is
+    used if set, and False never asks. The search is made directly if the server can't be reached or hasn't
+    scanned the key yet, and when searching a catalog or with since or stats
     - **kwargs: Keyword arguments mapping search terms to values for matching. Multiple values can
     be assigned to each search term - only one needs to match for it to be included.
     Output:
     A dataset_info_collection object containing a list of dataset_info objects corresponding to
     successful matches.
     """
-    return paths(key, yaml_path)(exact_match, **kwargs)
+    previous, cache = _since(since, cache)
+    if catalog is None and since is None and not stats:
+        format_dirs, format_file, unique = _load_paths(key, yaml_path)
+        all_data = _datasets_from_server(server, key, format_dirs, format_file, unique, exact_match, cache, threads, kwargs)
+        if all_data is not None:
+            return all_data
+    all_data = paths(key, yaml_path, cache, threads, workers, executor, catalog, stats)(exact_match, **kwargs)
+    if previous is not None:
+        all_data.changes = _find_changes(previous, all_data)
+    return all_data
+
+
+def iter_datasets(key, yaml_path = "paths.yml", exact_match = False, cache = False, threads = 8, merge_roots = True, workers = None, executor = None, stats = False, **kwargs):
+    """
+    Generator version of get_datasets, which yields each dataset as soon as it is found (see iter_filter_all).
+    Inputs:
+    - key: The name of the paths being referenced within the yaml file
+    - yaml_path: The path of the yaml file (default "paths.yml" in working directory)
+    - exact_match: Whether to match search terms exactly, default to False. Otherwise a substring 
+    is considered a match
+    - cache: Whether to keep directory listings in a directory_cache (see get_datasets)
+    - threads: The number of directories to list at the same time while searching (default 8)
+    - merge_roots: Whether to merge datasets found under several roots (default True, see iter_filter_all)
+    - workers, executor: Split the search between processes or an executor (see filter_all)
+    - stats: Whether to keep counts and timings of the search, in every dataset's "stats" (see filter_all)
+    - **kwargs: Keyword arguments mapping search terms to values for matching
+    Yields:
+    dataset_info objects, in the same order as get_datasets.
+    """
+    format_dirs, format_file, unique = _load_paths(key, yaml_path)
+    cache = _get_cache(cache, key, format_dirs, format_file)
+    yield from iter_filter_all(format_dirs, format_file, unique, exact_match, cache, threads, merge_roots, workers, executor, stats, **kwargs)
+
+
+class finder:
+    """
+    A session for searching the entries of a paths yaml file, for scripts and notebooks that search more than once.
+    The file is read and checked once when the session is made, and the formats of every entry are compiled then
+    (so mistakes in the file are found straight away rather than part way through a search). The directory_cache
+    and scan_stats of each entry are kept by the session and used by every search of that entry.
+    Searches take the same arguments as the functions of the same name (get_datasets etc.), apart from those given here.
+    Inputs:
+    - yaml_path: The path of the yaml file (default "paths.yml" next to this file)
+    - cache: Whether to keep directory listings in a directory_cache (see get_datasets). If True, each entry has its
+    own cache in the user's cache directory. A path or directory_cache is shared by every entry
+    - threads: The number of directories to list at the same time while searching (default 8)
+    - workers, executor: Split each search between processes or an executor (see filter_all)
+    - stats: If True, the counts and timings of every search of an entry are added up in stats[key] (see scan_stats)
+    - server: The socket of a dataset_server to ask for datasets and files before searching (see get_datasets)
+    Example:
+    session = finder()
+    bias_corrected = session.get_datasets("ACS_BC", var = "pr")
+    downscaled = session.get_datasets("ACS_DS", var = "pr")
+    """
+    def __init__(self, yaml_path = "paths.yml", cache = False, threads = 8, workers = None, executor = None, stats = False, server = None):
+        self.yaml_path = yaml_path
+        self.entries = _read_paths_file(yaml_path)
+        if not isinstance(self.entries, dict):
+            raise ValueError(f"{yaml_path} should map keys to entries with format_dirs and format_file")
+        for key, entry in self.entries.items():
+            _check_paths_entry(key, entry)
+
+        self.threads = threads
+        self.workers = workers
+        self.executor = executor
+        self.server = server
+
+        # directory_cache of each entry, made when the entry is first searched (a single cache is shared unless cache is True)
+        self.cache = cache
+        self.caches = {}
+        self._shared_cache = _get_cache(cache) if cache is not True else None
+
+        # scan_stats of each entry, if stats is True
+        self.stats = {key: scan_stats() for key in self.entries} if stats else None
+
+    def __repr__(self):
+        return f"finder({self.yaml_path!r}, keys = {self.keys()})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def keys(self):
+        return list(self.entries)
+
+    def entry(self, key):
+        """
+        Get an entry of the yaml file.
+        Returns:
+        A tuple of (format_dirs, format_file, unique), where unique is None if the entry doesn't have it.
+        """
+        if key not in self.entries:
+            raise KeyError(f'"{key}" is not in {self.yaml_path} (the keys are {", ".join(self.entries)})')
+        entry = copy.deepcopy(self.entries[key])
+        return entry["format_dirs"], entry["format_file"], entry.get("unique")
+
+    def get_cache(self, key):
+        """
+        Get the directory_cache used for an entry, or None if the session isn't using a cache.
+        """
+        if key not in self.caches:
+            if self.cache is True:
+                format_dirs, format_file, unique = self.entry(key)
+                self.caches[key] = _get_cache(True, key, format_dirs, format_file)
+            else:
+                self.caches[key] = self._shared_cache
+        return self.caches[key]
+
+    def paths(self, key, catalog = None):
+        """
+        Get a function calling filter_all with the paths of an entry (see paths).
+        """
+        format_dirs, format_file, unique = self.entry(key)
+        stats = self.stats[key] if self.stats is not None else False
+        return _use_paths(format_dirs, format_file, unique, self.get_cache(key), self.threads, self.workers, self.executor, catalog, stats)
+
+    def get_datasets(self, key, exact_match = False, catalog = None, since = None, **kwargs):
+        """
+        Search an entry and return the datasets found (see get_datasets).
+        """
+        format_dirs, format_file, unique = self.entry(key)
+        previous, cache = _since(since, self.get_cache(key))
+        stats = self.stats[key] if self.stats is not None else False
+
+        if catalog is None and since is None and not stats:
+            all_data = _datasets_from_server(self.server, key, format_dirs, format_file, unique, exact_match, cache, self.threads, kwargs)
+            if all_data is not None:
+                return all_data
+        all_data = _use_paths(format_dirs, format_file, unique, cache, self.threads, self.workers, self.executor, catalog, stats)(exact_match, **kwargs)
+        if previous is not None:
+            all_data.changes = _find_changes(previous, all_data)
+        return all_data
+
+    def get_files(self, key, exact_match = False, **kwargs):
+        """
+        Search an entry and return the files chosen from every dataset found (see get_files).
+        """
+        format_dirs, format_file, unique = self.entry(key)
+        if self.stats is None:
+            files = _files_from_server(self.server, key, format_dirs, format_file, unique, exact_match, kwargs)
+            if files is not None:
+                return files
+        return self.get_datasets(key, exact_match, **kwargs).get_files()
+
+    def iter_datasets(self, key, exact_match = False, merge_roots = True, stop = None, **kwargs):
+        """
+        Search an entry, yielding each dataset as soon as it is found (see iter_datasets). The search finishes early
+        once stop (a threading.Event) is set.
+        """
+        format_dirs, format_file, unique = self.entry(key)
+        stats = self.stats[key] if self.stats is not None else None
+        yield from iter_filter_all(format_dirs, format_file, unique, exact_match, self.get_cache(key), self.threads, merge_roots, self.workers, self.executor, stats, stop, **kwargs)
+
+    def close(self):
+        """
+        Write any new listings to the session's caches and close them.
+        """
+        for cache in set(self.caches.values()) | {self._shared_cache}:
+            if cache is not None:
+                cache.close()
+        self.caches = {}
+
+
+def _encode_search_value(value):
+    """
+    Turn a search value into something that can be written as JSON (see _decode_search_value), keeping the
+    types that are matched differently (tuples, year_interval and search_term objects).
+    Raises TypeError for values that can't be sent, such as generators.
+    """
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, year_interval):
+        return {"year_interval": [value.start, value.end]}
+    if isinstance(value, search_term):
+        return {"search_term": value.kind, "values": [_encode_search_value(item) for item in value.values]}
+    if isinstance(value, tuple):
+        return {"tuple": [_encode_search_value(item) for item in value]}
+    if isinstance(value, (list, set, frozenset)):
+        return [_encode_search_value(item) for item in value]
+    raise TypeError(f"Can't send {value!r} as a search value")
+
+
+def _decode_search_value(value):
+    """
+    Turn a search value from _encode_search_value back into the value it was made from.
+    """
+    if isinstance(value, list):
+        return [_decode_search_value(item) for item in value]
+    if isinstance(value, dict):
+        if "year_interval" in value:
+            return year_interval(*value["year_interval"])
+        if "search_term" in value:
+            return search_term(value["search_term"], [_decode_search_value(item) for item in value["values"]])
+        if "tuple" in value:
+            return tuple(_decode_search_value(item) for item in value["tuple"])
+        raise ValueError(f"Unknown search value {value!r}")
+    return value
+
+
+def _search_patterns(value):
+    """
+    Get every glob_ and regex_ pattern in a search value, including those inside not_ terms and lists.
+    """
+    if isinstance(value, search_term):
+        if value.kind == "not":
+            return _search_patterns(list(value.values))
+        return [str(pattern) for pattern in value.values]
+    if isinstance(value, (list, tuple)):
+        return [pattern for item in value for pattern in _search_patterns(item)]
+    return []
+
+
+def _dataset_to_json(dataset):
+    """
+    Get a dataset as a dictionary that can be written as JSON (see _dataset_from_json). Only the files in the
+    selection are kept, so the dataset's walk is limited to the selected search terms (see scan_files).
+    """
+    return {"data": dataset.data, "roots": dataset.roots, "format_file": dataset.format_file,
+            "selected": {key: _encode_search_value(value) for key, value in dataset.selected.items()},
+            "exact_match_dict": dataset.exact_match_dict, "priority": dataset.priority,
+            "tables": [table.to_json(rows) for table, rows in dataset.get_rows(True)]}
+
+
+def _dataset_from_json(encoded, cache = None, threads = 8):
+    """
+    Make a dataset_info from a dictionary made by _dataset_to_json. The files outside of the selection weren't
+    sent, so they are found again from disk (with the given cache) if the selection of those keys changes.
+    """
+    dataset = dataset_info(encoded["data"], encoded["roots"][0], encoded["format_file"], cache, threads)
+    dataset.roots = list(encoded["roots"])
+    dataset.selected = {key: _decode_search_value(value) for key, value in encoded["selected"].items()}
+    dataset.exact_match_dict = encoded["exact_match_dict"]
+    dataset.priority = encoded["priority"]
+    dataset._file_tables = {root: file_table.from_json(table) for root, table in zip(dataset.roots, encoded["tables"])}
+    dataset._scan_terms = {key: (values, dataset.exact_match_dict[key]) for key, values in dataset.selected.items()}
+    return dataset
+
+
+class _server_handler(socketserver.StreamRequestHandler):
+    # a single JSON request per connection, answered with a single JSON reply (see dataset_server.answer)
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline(dataset_server.max_request_size))
+            reply = self.server.dataset_server.answer(request)
+        except Exception as e:
+            reply = {"error": type(e).__name__, "message": str(e)}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class dataset_server:
+    """
+    A long running process keeping every dataset of the entries of a paths yaml file in memory, so that searches
+    made by many people (or many jobs) don't each pay for walking the same directories. Searches are answered from
+    memory over a UNIX socket, and are the same as get_datasets would give at the time of the last scan.
+    An entry is scanned the first time it is asked for (searches made before the scan finishes are done directly
+    by the client), then scanned again in the background every refresh_interval seconds. With a cache, only
+    directories that have been modified since the last scan are listed again (see directory_cache).
+    Clients use the server by giving its socket to get_datasets, get_files or finder (or by setting the
+    DATASET_FINDER_SOCKET environment variable), and search directly if it can't answer.
+    Start one with "python dataset_finder.py serve --socket PATH" (see main), or with start() in a background thread.
+    Inputs:
+    - socket_path: The path of the UNIX socket to listen on
+    - yaml_path: The path of the yaml file (default "paths.yml" next to this file)
+    - keys: Entries to scan straight away, instead of when they are first asked for
+    - cache: Whether to keep directory listings in a directory_cache (see finder), default True
+    - threads: The number of directories to list at the same time while scanning (default 8)
+    - refresh_interval: Seconds between scans of each entry (default 600)
+    - socket_mode: Permissions of the socket, e.g. 0o660 (the default) to let the group use it
+    Example:
+    server = dataset_server("/tmp/dataset_finder.sock", keys = ["ACS_BC"])
+    server.start()
+    datasets = get_datasets("ACS_BC", server = "/tmp/dataset_finder.sock", var = "pr")
+    """
+    # largest request read, in bytes
+    max_request_size = 1000000
+    # longest glob_ and regex_ patterns (added up) compiled for a request, in characters. Patterns are matched while
+    # holding the GIL, so longer ones are searched by the client instead of tying up the server
+    max_pattern_length = 200
+
+    def __init__(self, socket_path, yaml_path = "paths.yml", keys = None, cache = True, threads = 8, refresh_interval = 600, socket_mode = 0o660):
+        self.socket_path = socket_path
+        self.session = finder(yaml_path, cache = cache, threads = threads)
+        self.refresh_interval = refresh_interval
+
+        # the datasets of each entry as separate datasets for each root, in the order get_datasets finds them,
+        # and the time of the scan they came from. Each scan replaces the list of an entry as a whole
+        self.datasets = {}
+        self.scanned = {}
+
+        # entries to keep scanned, in the order they were asked for
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        for key in keys or []:
+            self.session.entry(key)
+            self._keys[key] = True
+
+        if os.path.exists(socket_path):
+            if _ask_server(socket_path, {"command": "ping"}) is not None:
+                raise OSError(f"A dataset_server is already running on {socket_path}")
+            # left behind by a server that was stopped
+            os.remove(socket_path)
+        self._server = socketserver.ThreadingUnixStreamServer(socket_path, _server_handler)
+        self._server.daemon_threads = True
+        self._server.dataset_server = self
+        os.chmod(socket_path, socket_mode)
+
+        self._threads = [threading.Thread(target = self._scan_loop, daemon = True)]
+        self._threads[0].start()
+
+    def __repr__(self):
+        return f"dataset_server({self.socket_path!r}, keys = {list(self.datasets)})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def load(self, key):
+        """
+        Ask for an entry to be scanned in the background (if it hasn't been already), and kept scanned from then on.
+        """
+        self.session.entry(key)
+        with self._lock:
+            if key not in self._keys:
+                self._keys[key] = True
+                self._wake.set()
+
+    def scan(self, key):
+        """
+        Scan an entry now, replacing its datasets once the scan has finished. Closing the server stops the scan
+        between directories, and the datasets of the last finished scan are kept.
+        """
+        start = time.time()
+        datasets = list(self.session.iter_datasets(key, merge_roots = False, stop = self._stop))
+        if self._stop.is_set():
+            return
+        with self._lock:
+            self.datasets[key] = datasets
+            self.scanned[key] = start
+
+    def _scan_loop(self):
+        # scan each entry when first asked for, and again once refresh_interval has passed
+        while not self._stop.is_set():
+            with self._lock:
+                keys = list(self._keys)
+            for key in keys:
+                if self._stop.is_set():
+                    return
+                if key in self.scanned and time.time() - self.scanned[key] < self.refresh_interval:
+                    continue
+                try:
+                    self.scan(key)
+                except Exception as e:
+                    # the last scan is kept, and tried again after refresh_interval
+                    print(f"ERROR: Scan of {key} failed: {e}")
+                    with self._lock:
+                        self.scanned[key] = time.time()
+
+            waits = [self.scanned[key] + self.refresh_interval - time.time() for key in keys if key in self.scanned]
+            self._wake.wait(max(min(waits, default = self.refresh_interval), 1))
+            self._wake.clear()
+
+    def query(self, key, exact_match = False, **search_terms):
+        """
+        Search the datasets of an entry from its last scan, giving the same result as get_datasets did then.
+        Raises KeyError if the entry hasn't been scanned yet.
+        Returns:
+        A dataset_info_collection object.
+        """
+        format_dirs, format_file, unique = self.session.entry(key)
+        datasets = self.datasets[key]
+
+        # as in _find_datasets, but selecting from the tables of the scan instead of walking each dataset again
+        matcher = search_matcher(search_terms, exact_match)
+        found = []
+        for item in datasets:
+            if not matcher.match(item.data):
+                continue
+            dataset = dataset_info(dict(item.data), item.roots[0], item.format_file, item.cache, item.threads)
+            dataset._file_tables = dict(item._file_tables)
+            for search_key in search_terms:
+                if search_key not in dataset.data and search_key in item.info:
+                    dataset.select(**{search_key: search_terms[search_key]}, exact_match = exact_match)
+            if dataset.any_files():
+                found.append(dataset)
+
+        return _collect_datasets(found, unique)
+
+    def answer(self, request):
+        """
+        Answer a request from a client (see _ask_server), which is a dictionary with:
+        - command: "get_datasets", "get_files" or "ping"
+        - key: The entry to search
+        - entry: The client's [format_dirs, format_file, unique] for the entry, which must match the server's
+        - exact_match, search_terms: As given to get_datasets (search_terms encoded by _encode_search_value)
+        Returns:
+        A dictionary with the datasets (see _dataset_to_json) or the files and clash messages, and the time of the
+        scan they came from. If the request can't be answered, the dictionary has an "error" instead.
+        """
+        command = request.get("command")
+        if command == "ping":
+            return {"keys": list(self.datasets)}
+        if command not in ("get_datasets", "get_files"):
+            return {"error": "unknown_command", "message": f"Unknown command {command!r}"}
+
+        key = request.get("key")
+        if key not in self.session.entries:
+            return {"error": "unknown_key", "message": f'"{key}" is not in {self.session.yaml_path}'}
+        if request.get("entry") != json.loads(json.dumps(self.session.entry(key))):
+            return {"error": "different_entry", "message": f'"{key}" is different in {self.session.yaml_path}'}
+        if key not in self.datasets:
+            self.load(key)
+            return {"error": "not_ready", "message": f'"{key}" is being scanned'}
+
+        search_terms = {name: _decode_search_value(value) for name, value in request.get("search_terms", {}).items()}
+        if sum(len(pattern) for pattern in _search_patterns(list(search_terms.values()))) > self.max_pattern_length:
+            return {"error": "pattern_too_long", "message": f"glob_ and regex_ patterns can be at most {self.max_pattern_length} characters in all"}
+        scanned = self.scanned[key]
+        collection = self.query(key, request.get("exact_match", False), **search_terms)
+
+        if command == "get_files":
+            files = []
+            messages = []
+            for item in collection:
+                try:
+                    item_files, item_messages = item._choose_files()
+                except ValueError as e:
+                    # as get_datasets(...).get_files() would have raised, after the messages so far
+                    return {"error": "ValueError", "message": str(e), "messages": messages, "scanned": scanned}
+                files += item_files
+                messages += item_messages
+            return {"files": files, "messages": messages, "scanned": scanned}
+
+        return {"datasets": [_dataset_to_json(item) for item in collection], "scanned": scanned}
+
+    def serve_forever(self):
+        """
+        Answer requests until close is called (from another thread) or the process is stopped.
+        """
+        self._server.serve_forever()
+
+    def start(self):
+        """
+        Answer requests in a background thread, e.g. to run a server in the same process as its clients.
+        """
+        thread = threading.Thread(target = self.serve_forever, daemon = True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def close(self):
+        """
+        Stop answering requests and scanning, remove the socket and close the session's caches.
+        """
+        self._stop.set()
+        self._wake.set()
+        if len(self._threads) > 1:
+            self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.session.close()
+
+
+# seconds to wait for a dataset_server to accept a request or send the next part of its reply
+server_timeout = 30
+
+def _ask_server(server, request):
+    """
+    Send a request to a dataset_server (see dataset_server.answer).
+    Inputs:
+    - server: The path of the server's socket. If None, the DATASET_FINDER_SOCKET environment variable is used,
+    and if that isn't set either (or server is False) nothing is sent
+    - request: The request dictionary, with any search terms not yet encoded
+    Returns:
+    The server's reply, or None if there is no server or it couldn't be reached.
+    """
+    if server is None:
+        server = os.environ.get("DATASET_FINDER_SOCKET")
+    if not server:
+        return None
+
+    import socket
+
+    try:
+        request = dict(request)
+        if "search_terms" in request:
+            request["search_terms"] = {key: _encode_search_value(value) for key, value in request["search_terms"].items()}
+        message = json.dumps(request).encode() + b"\n"
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(server_timeout)
+            connection.connect(server)
+            connection.sendall(message)
+            connection.shutdown(socket.SHUT_WR)
+            with connection.makefile("rb") as reply:
+                return json.loads(reply.readline())
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def _datasets_from_server(server, key, format_dirs, format_file, unique, exact_match, cache, threads, search_terms):
+    """
+    Ask a dataset_server for the datasets of a search (see get_datasets).
+    Returns:
+    A dataset_info_collection object the same as filter_all would give, or None if the server couldn't answer.
+    """
+    reply = _ask_server(server, {"command": "get_datasets", "key": key, "entry": [format_dirs, format_file, unique],
+                                 "exact_match": exact_match, "search_terms": search_terms})
+    if reply is None or "datasets" not in reply:
+        return None
+
+    cache = _get_cache(cache, key, format_dirs, format_file)
+    all_data = dataset_info_collection([_dataset_from_json(item, cache, threads) for item in reply["datasets"]])
+    # refreshing searches directly
+    all_data._search = (filter_all, dict(format_dirs_list = format_dirs, format_files_list = format_file, unique = unique, exact_match = exact_match,
+                                         cache = cache, threads = threads, workers = None, executor = None, stats = None, **search_terms))
+    return all_data
+
+
+def _files_from_server(server, key, format_dirs, format_file, unique, exact_match, search_terms):
+    """
+    Ask a dataset_server for the files of a search (see get_files), printing any clash messages.
+    Raises ValueError if a clash couldn't be resolved, as get_files would.
+    Returns:
+    A list of file paths, or None if the server couldn't answer.
+    """
+    reply = _ask_server(server, {"command": "get_files", "key": key, "entry": [format_dirs, format_file, unique],
+                                 "exact_match": exact_match, "search_terms": search_terms})
+    if reply is None or not ("files" in reply or reply.get("error") == "ValueError"):
+        return None
+
+    for message in reply["messages"]:
+        print(message)
+    if "files" not in reply:
+        raise ValueError(reply["message"])
+    return reply["files"]
+
+
+def get_files(key, yaml_path = "paths.yml", exact_match = False, cache = False, threads = 8, server = None, **kwargs):
+    """
+    Search an entry and return the files chosen from every dataset found, the same as get_datasets(...).get_files().
+    If a dataset_server is running, only the files are sent back from it instead of every dataset.
+    Inputs:
+    - key: The name of the paths being referenced within the yaml file
+    - yaml_path: The path of the yaml file (default "paths.yml" in working directory)
+    - exact_match: Whether to match search terms exactly (see get_datasets)
+    - cache: Whether to keep directory listings in a directory_cache if searching directly (see get_datasets)
+    - threads: The number of directories to list at the same time if searching directly (default 8)
+    - server: The socket of a dataset_server to ask first (see get_datasets)
+    - **kwargs: Keyword arguments mapping search terms to values for matching
+    Output:
+    A list of file paths.
+    """
+    format_dirs, format_file, unique = _load_paths(key, yaml_path)
+    files = _files_from_server(server, key, format_dirs, format_file, unique, exact_match, kwargs)
+    if files is not None:
+        return files
+    return get_datasets(key, yaml_path, exact_match, cache, threads, server = False, **kwargs).get_files()
+
+
+async def _afind_datasets(format_dirs_list, format_files_list, exact_match, cache, threads, concurrency, search_terms):
+    """
+    Search each format_dirs in a worker thread (at most concurrency at once), yielding (ordinal, dataset) tuples
+    as the datasets are found. The ordinal is a (format_dirs index, position) tuple giving the order
+    that filter_all would have found the dataset in.
+    If the generator is closed or cancelled, the searches still running are told to stop.
+    """
+    if isinstance(format_dirs_list, str):
+        format_dirs_list = [format_dirs_list]
+
+    if isinstance(format_files_list, str):
+        format_files_list = [format_files_list]
+
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    def put(item):
+        # the event loop may already be gone if the search was abandoned
+        if not stop.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def search(index, format_dirs):
+        try:
+            datasets = _find_datasets(format_dirs, format_files_list, exact_match, cache, threads, search_terms, stop)
+            for position, dataset in enumerate(datasets):
+                put(((index, position), dataset))
+            put(finished)
+        except Exception as e:
+            put(e)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers = concurrency)
+    try:
+        for index, format_dirs in enumerate(format_dirs_list):
+            loop.run_in_executor(executor, search, index, format_dirs)
+
+        remaining = len(format_dirs_list)
+        while remaining:
+            item = await queue.get()
+            if item is finished:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+
+    finally:
+        stop.set()
+        executor.shutdown(wait = False, cancel_futures = True)
+        if cache is not None:
+            cache.flush()
+
+
+async def aiter_datasets(key, yaml_path = "paths.yml", exact_match = False, cache = False, threads = 8, concurrency = 4, **kwargs):
+    """
+    Asynchronous version of get_datasets that yields each dataset as soon as it is found, so that results can
+    be used while the search carries on - for example inside a Jupyter notebook or an async web service.
+    Every format_dirs of the key is searched at the same time in worker threads.
+    A dataset found under several roots is only yielded once, the first time it is found. Roots found after
+    that are added to the dataset that was already yielded, so it ends up the same as from get_datasets.
+    Closing the generator (or cancelling the task using it) stops the search.
+    Inputs:
+    - key: The name of the paths being referenced within the yaml file
+    - yaml_path: The path of the yaml file (default "paths.yml" in working directory)
+    - exact_match: Whether to match search terms exactly, default to False. Otherwise a substring 
+    is considered a match
+    - cache: Whether to keep directory listings in a directory_cache (see get_datasets)
+    - threads: The number of directories to list at the same time within each search (default 8)
+    - concurrency: The number of format_dirs to search at the same time (default 4)
+    - **kwargs: Keyword arguments mapping search terms to values for matching
+    Yields:
+    dataset_info objects, in the order they are found.
+    """
+    format_dirs, format_file, unique = _load_paths(key, yaml_path)
+    cache = _get_cache(cache, key, format_dirs, format_file)
+
+    found = {}
+    ordinals = {}
+    async for ordinal, dataset in _afind_datasets(format_dirs, format_file, exact_match, cache, threads, concurrency, kwargs):
+        for root in dataset.roots:
+            ordinals[root] = ordinal
+
+        data = frozenset(dataset.data.items())
+        if data in found:
+            existing = found[data]
+            existing.attempt_merge(dataset)
+            # keep the roots in the order get_datasets would have them, as clashes between roots depend on it
+            existing.roots.sort(key = lambda root: ordinals[root])
+            existing.refresh_info()
+            continue
+
+        found[data] = dataset
+        if unique:
+            for unique_key, options in unique.items():
+                dataset.prioritise(unique_key, **options)
+        yield dataset
+
+
+async def aget_datasets(key, yaml_path = "paths.yml", exact_match = False, cache = False, threads = 8, concurrency = 4, **kwargs):
+    """
+    Asynchronous version of get_datasets, which searches every format_dirs of the key at the same time in
+    worker threads instead of blocking the event loop. The returned collection is identical to the one
+    get_datasets would return, regardless of which search finishes first.
+    See aiter_datasets to use datasets as they are found instead of waiting for the full collection.
+    Inputs:
+    - key: The name of the paths being referenced within the yaml file
+    - yaml_path: The path of the yaml file (default "paths.yml" in working directory)
+    - exact_match: Whether to match search terms exactly, default to False. Otherwise a substring 
+    is considered a match
+    - cache: Whether to keep directory listings in a directory_cache (see get_datasets)
+    - threads: The number of directories to list at the same time within each search (default 8)
+    - concurrency: The number of format_dirs to search at the same time (default 4)
+    - **kwargs: Keyword arguments mapping search terms to values for matching
+    Output:
+    A dataset_info_collection object containing a list of dataset_info objects corresponding to
+    successful matches.
+    """
+    format_dirs, format_file, unique = _load_paths(key, yaml_path)
+    cache = _get_cache(cache, key, format_dirs, format_file)
+
+    found = [item async for item in _afind_datasets(format_dirs, format_file, exact_match, cache, threads, concurrency, kwargs)]
+
+    # put the datasets back in the order a single search would have found them in before merging
+    found.sort(key = lambda item: item[0])
+    return _collect_datasets([dataset for ordinal, dataset in found], unique)
+
+
+def main(args = None):
+    """
+    Command line interface, currently only to run a dataset_server:
+    python dataset_finder.py serve --socket PATH [--yaml paths.yml] [--keys ACS_BC ...] [--refresh 600] ...
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog = "dataset_finder")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    serve = commands.add_parser("serve", help = "keep the datasets of paths.yml in memory and answer searches over a UNIX socket")
+    serve.add_argument("--socket", default = os.environ.get("DATASET_FINDER_SOCKET"), help = "socket to listen on (default $DATASET_FINDER_SOCKET)")
+    serve.add_argument("--yaml", default = "paths.yml", help = "paths yaml file to serve (default paths.yml next to this file)")
+    serve.add_argument("--keys", nargs = "*", default = [], help = "entries to scan straight away instead of when first asked for")
+    serve.add_argument("--refresh", type = float, default = 600, help = "seconds between scans of each entry (default 600)")
+    serve.add_argument("--cache", default = True, help = "directory_cache file shared by every entry (default one for each entry in the user's cache directory)")
+    serve.add_argument("--no-cache", dest = "cache", action = "store_false", help = "list every directory again on each scan")
+    serve.add_argument("--threads", type = int, default = 8, help = "directories to list at the same time (default 8)")
+    serve.add_argument("--mode", type = lambda value: int(value, 8), default = 0o660, help = "permissions of the socket (default 660)")
+    args = parser.parse_args(args)
+
+    if not args.socket:
+        parser.error("serve needs --socket or DATASET_FINDER_SOCKET")
+
+    with dataset_server(args.socket, args.yaml, args.keys, args.cache, args.threads, args.refresh, args.mode) as server:
+        print(f"Serving {server.session.yaml_path} on {args.socket}", flush = True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
 
+if __name__ == "__main__":
+    main()
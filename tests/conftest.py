@@ -0,0 +1,70 @@
+import os
+import sys
+import itertools
+
+import yaml
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_files(root, paths):
+    """
+    Create an empty file (or folder, for paths ending in a separator) for each path under root.
+    """
+    for path in paths:
+        path = os.path.join(str(root), path)
+        if path.endswith(os.sep):
+            os.makedirs(path, exist_ok = True)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            open(path, "w").close()
+
+
+def write_paths(root, key, format_dirs, format_file, unique = None):
+    """
+    Write a paths.yml with a single entry under root, returning its path.
+    """
+    entry = {"format_dirs": format_dirs, "format_file": format_file}
+    if unique is not None:
+        entry["unique"] = unique
+    yaml_path = os.path.join(str(root), "paths.yml")
+    with open(yaml_path, "w") as f:
+        yaml.safe_dump({key: entry}, f)
+    return yaml_path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """
+    A small tree of 2 orgs x 2 gcms x 2 scenarios, each with two variables, two date_created versions and
+    two years. Returns the path of its paths.yml (with the key "TEST").
+    """
+    paths = []
+    for org, gcm, scenario, var, version, year in itertools.product(["BOM", "CSIRO"], ["ACCESS-CM2", "CESM2"], ["historical", "ssp370"],
+                                                                   ["pr", "tas"], ["v20240101", "v20240201"], [2000, 2001]):
+        paths.append(f"data/{org}/{gcm}/{scenario}/{var}/{version}/{var}_{gcm}_{scenario}_{year}0101-{year}1231.nc")
+    make_files(tmp_path, paths)
+    return write_paths(tmp_path, "TEST", os.path.join(str(tmp_path), "data/{org}/{gcm}/{scenario}/"),
+                       "/{var}/{date_created}/{var}_{gcm}_{scenario}_{year!start}0101-{year!end}1231.nc",
+                       {"date_created": {"default": "high", "preferences": []}})
+
+
+@pytest.fixture
+def two_roots(tmp_path):
+    """
+    Two format_dirs under different roots: "data" is the same as in tree, and "extra" has a newer date_created of
+    some of its datasets (so they are merged across roots) as well as datasets only found there.
+    Returns the path of its paths.yml (with the key "TEST").
+    """
+    paths = []
+    for org, gcm, scenario, var, version, year in itertools.product(["BOM", "CSIRO"], ["ACCESS-CM2", "CESM2"], ["historical", "ssp370"],
+                                                                   ["pr", "tas"], ["v20240101", "v20240201"], [2000, 2001]):
+        paths.append(f"data/{org}/{gcm}/{scenario}/{var}/{version}/{var}_{gcm}_{scenario}_{year}0101-{year}1231.nc")
+    for org, gcm, scenario, var, year in itertools.product(["BOM", "UQ"], ["CESM2"], ["ssp370", "ssp585"], ["pr"], [2000, 2001, 2002]):
+        paths.append(f"extra/{org}/{gcm}/{scenario}/{var}/v20240301/{var}_{gcm}_{scenario}_{year}0101-{year}1231.nc")
+    make_files(tmp_path, paths)
+    format_dirs = [os.path.join(str(tmp_path), f"{root}/{{org}}/{{gcm}}/{{scenario}}/") for root in ["data", "extra"]]
+    return write_paths(tmp_path, "TEST", format_dirs,
+                       "/{var}/{date_created}/{var}_{gcm}_{scenario}_{year!start}0101-{year!end}1231.nc",
+                       {"date_created": {"default": "high", "preferences": []}})
@@ -0,0 +1,42 @@
+import io
+import asyncio
+import contextlib
+
+import pytest
+
+from dataset_finder import get_datasets, aget_datasets, aiter_datasets
+
+
+def describe(collection):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [(item.data, item.roots, sorted(file for info, file in item.get_generated_info(True)), item.get_files()) for item in collection]
+
+
+SEARCHES = [{}, {"org": "BOM"}, {"gcm": "CESM2", "var": "pr"}, {"scenario": "ssp585"}, {"year": (2002, 2002)}]
+
+
+@pytest.mark.parametrize("search_terms", SEARCHES)
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_aget_datasets_is_the_same_as_get_datasets(two_roots, search_terms, concurrency):
+    found = asyncio.run(aget_datasets("TEST", two_roots, concurrency = concurrency, **search_terms))
+    assert describe(found) == describe(get_datasets("TEST", two_roots, **search_terms))
+
+
+@pytest.mark.parametrize("search_terms", SEARCHES)
+def test_aiter_datasets_finds_the_same_datasets(two_roots, search_terms):
+    async def collect():
+        return [dataset async for dataset in aiter_datasets("TEST", two_roots, **search_terms)]
+
+    found = asyncio.run(collect())
+    expected = describe(get_datasets("TEST", two_roots, **search_terms))
+    # datasets are yielded as they are found, and roots found later are merged into them
+    assert sorted(describe(found), key = repr) == sorted(expected, key = repr)
+
+
+def test_aiter_datasets_can_stop_early(two_roots):
+    async def first():
+        async for dataset in aiter_datasets("TEST", two_roots, threads = 1):
+            return dataset
+
+    dataset = asyncio.run(first())
+    assert dataset.data in [item.data for item in get_datasets("TEST", two_roots)]
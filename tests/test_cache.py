@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import concurrent.futures
+
+from dataset_finder import directory_cache, get_datasets, _get_cache
+
+
+def test_file_added_in_the_same_tick_is_found(tmp_path):
+    (tmp_path / "a.nc").touch()
+    cache = directory_cache()
+    assert cache.list_dir(str(tmp_path)) == ([], ["a.nc"])
+
+    # a second file added without the directory's modification time changing, as on a coarse clock
+    mtime = os.stat(tmp_path).st_mtime_ns
+    (tmp_path / "b.nc").touch()
+    os.utime(tmp_path, ns = (mtime, mtime))
+    assert sorted(cache.list_dir(str(tmp_path))[1]) == ["a.nc", "b.nc"]
+    assert cache.hits == 0
+
+
+def test_old_directories_are_not_listed_again(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.nc").touch()
+    os.utime(data, (0, 0))
+    cache = directory_cache(str(tmp_path / "cache.sqlite"))
+    cache.list_dir(str(data))
+    cache.close()
+
+    cache = directory_cache(str(tmp_path / "cache.sqlite"))
+    assert cache.list_dir(str(data)) == ([], ["a.nc"])
+    assert (cache.hits, cache.misses) == (1, 0)
+    cache.close()
+
+
+def test_caches_without_listing_times_are_checked_again(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.nc").touch()
+    os.utime(data, (0, 0))
+    path = str(tmp_path / "cache.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE listings (path TEXT PRIMARY KEY, mtime INTEGER, dirs TEXT, files TEXT)")
+    connection.execute("INSERT INTO listings VALUES (?, ?, ?, ?)", (str(data), 0, "", "old.nc"))
+    connection.commit()
+    connection.close()
+
+    cache = directory_cache(path)
+    assert cache.list_dir(str(data)) == ([], ["a.nc"])
+    cache.close()
+    cache = directory_cache(path)
+    assert cache.list_dir(str(data)) == ([], ["a.nc"])
+    assert cache.hits == 1
+    cache.close()
+
+
+def test_counts_from_many_threads(tmp_path):
+    for name in "abcd":
+        (tmp_path / name).mkdir()
+        os.utime(tmp_path / name, (0, 0))
+    cache = directory_cache()
+    paths = [str(tmp_path / name) for name in "abcd"] * 2000
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        list(executor.map(cache.list_dir, paths))
+    assert cache.hits + cache.misses == len(paths)
+    assert cache.misses == 4
+
+
+def test_caches_are_reused_until_closed(tree, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = _get_cache(path)
+    assert _get_cache(path) is cache
+
+    # both searches list directories through the same cache
+    get_datasets("TEST", tree, cache = path)
+    listed = cache.hits + cache.misses
+    assert listed > 0
+    get_datasets("TEST", tree, cache = path)
+    assert cache.hits + cache.misses == 2 * listed
+
+    cache.close()
+    reopened = _get_cache(path)
+    assert reopened is not cache and reopened.connection is not None
+    reopened.close()
@@ -0,0 +1,85 @@
+import io
+import os
+import json
+import contextlib
+
+import pytest
+
+from conftest import make_files, write_paths
+from dataset_finder import get_datasets, load_catalog, dataset_info_collection, year_interval, _read_catalog
+
+
+def describe(collection):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [(item.data, item.roots, sorted(file for info, file in item.get_generated_info(True)), item.get_files()) for item in collection]
+
+
+@pytest.fixture
+def tree_without_var(tmp_path):
+    # no var in the format, so the catalog has no aggregation control
+    paths = [f"data/{gcm}/{scenario}/{gcm}_{scenario}_{version}_{year}.nc"
+             for gcm in ["ACCESS-CM2", "CESM2"] for scenario in ["historical", "ssp370"] for version in ["v1", "v2"] for year in [2000, 2001, 2002]]
+    make_files(tmp_path, paths)
+    return write_paths(tmp_path, "NOVAR", os.path.join(str(tmp_path), "data/{gcm}/{scenario}/"), "/{gcm}_{scenario}_{version}_{year}.nc",
+                       {"version": {"default": "high", "preferences": []}})
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet"])
+def test_catalog_round_trip_without_var(tree_without_var, tmp_path, extension):
+    if extension == ".parquet":
+        pytest.importorskip("pyarrow")
+    scanned = get_datasets("NOVAR", tree_without_var)
+    json_path = scanned.to_intake_esm(str(tmp_path / f"catalog{extension}"))
+    with open(json_path) as f:
+        assert "aggregation_control" not in json.load(f)
+
+    loaded = get_datasets("NOVAR", tree_without_var, catalog = json_path)
+    assert len(loaded) == len(scanned) == 4
+    assert describe(loaded) == describe(scanned)
+
+
+def test_catalog_without_dataset_keys(tree_without_var, tmp_path):
+    # catalogs written before the dataset keys were always kept
+    scanned = get_datasets("NOVAR", tree_without_var)
+    json_path = scanned.to_intake_esm(str(tmp_path / "catalog.csv"))
+    with open(json_path) as f:
+        description = json.load(f)
+    description.pop("dataset_finder")
+    with open(json_path, "w") as f:
+        json.dump(description, f)
+
+    unique = {"version": {"default": "high", "preferences": []}}
+    format_dirs = os.path.join(os.path.dirname(tree_without_var), "data/{gcm}/{scenario}/")
+    assert describe(load_catalog(json_path, unique, format_dirs_list = format_dirs)) == describe(scanned)
+    assert describe(load_catalog(json_path, unique)) == describe(scanned)
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet"])
+@pytest.mark.parametrize("year", [(2000, 2000), (2001, 2005), (1990, 1999), (1990, 2010)])
+def test_catalog_year_search_is_pushed_down(tree, tmp_path, monkeypatch, extension, year):
+    if extension == ".parquet":
+        pyarrow_dataset = pytest.importorskip("pyarrow.dataset")
+        # a row group for every file, so that those that can't match are skipped
+        monkeypatch.setattr(dataset_info_collection, "catalog_row_group_size", 1)
+
+        # count the row groups read
+        read_row_groups = []
+        file_system_dataset = pyarrow_dataset.FileSystemDataset
+        def recording(fragments, *args):
+            read_row_groups.extend(len(fragment.row_groups) for fragment in fragments)
+            return file_system_dataset(fragments, *args)
+        monkeypatch.setattr(pyarrow_dataset, "FileSystemDataset", recording)
+
+    scanned = get_datasets("TEST", tree)
+    table_path = str(tmp_path / f"catalog{extension}")
+    json_path = scanned.to_intake_esm(table_path)
+
+    columns, every = _read_catalog(table_path)
+    start, end = columns.index("start_year"), columns.index("end_year")
+    overlapping = [row for row in every if year_interval(row[start], row[end]).overlaps(year_interval(*year))]
+    assert _read_catalog(table_path, search_terms = {"year": year})[1] == overlapping
+    if extension == ".parquet":
+        assert read_row_groups == [len(overlapping)]
+
+    expected = describe(get_datasets("TEST", tree, year = year))
+    assert describe(get_datasets("TEST", tree, catalog = json_path, year = year)) == expected
@@ -0,0 +1,47 @@
+import pytest
+
+from dataset_finder import get_datasets, dataset_info_collection
+
+
+def scenarios(collection):
+    return [item.data["scenario"] for item in collection]
+
+
+def test_filter_after_sorting_in_place(tree):
+    datasets = get_datasets("TEST", tree)
+    assert scenarios(datasets.filter(scenario = "historical")) == ["historical"] * 4
+
+    datasets.items.sort(key = lambda item: item.data["scenario"], reverse = True)
+    assert scenarios(datasets.filter(scenario = "historical")) == ["historical"] * 4
+
+    datasets.items.reverse()
+    assert scenarios(datasets.filter(scenario = "historical")) == ["historical"] * 4
+
+
+def test_filter_after_replacing_an_item(tree):
+    datasets = get_datasets("TEST", tree)
+    datasets.filter(scenario = "historical")
+    ssp = datasets.filter(scenario = "ssp370").items[0]
+    position = next(position for position, item in enumerate(datasets.items) if item.data["scenario"] == "historical")
+    datasets.items[position] = ssp
+    assert scenarios(datasets.filter(scenario = "historical")) == ["historical"] * 3
+
+
+def test_filter_after_condensing_shared_items(tree):
+    datasets = get_datasets("TEST", tree)
+    datasets.filter(scenario = "historical")
+    datasets.filter(org = "BOM").condense("scenario")
+    # the condensed items are shared with datasets, and no longer have a scenario
+    assert len(datasets.filter(scenario = "historical")) == 2
+    assert len(datasets.filter(org = "BOM")) == 4
+    assert all("scenario" not in item.data for item in datasets.filter(org = "BOM"))
+
+
+@pytest.mark.parametrize("max_rows, rows", [(0, 1), (1, 1), (2, 2), (3, 3), (7, 7), (8, 8)])
+def test_html_shows_max_rows(tree, monkeypatch, max_rows, rows):
+    monkeypatch.setattr(dataset_info_collection, "max_rows", max_rows)
+    datasets = get_datasets("TEST", tree)
+    assert len(datasets) == 8
+    html = datasets._repr_html_()
+    # one row for the header, and one for the gap when rows are left out
+    assert html.count("<tr") == 1 + rows + (rows < 8)
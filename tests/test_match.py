@@ -0,0 +1,41 @@
+import pytest
+
+from dataset_finder import get_datasets, not_, glob_, regex_
+
+
+@pytest.mark.parametrize("search_terms, expected", [
+    ({"gcm": "ACCESS"}, True),
+    ({"gcm": "access"}, False),
+    ({"gcm": not_("CESM2")}, True),
+    ({"gcm": not_("ACCESS")}, False),
+    ({"gcm": glob_("access-*")}, True),
+    ({"gcm": regex_("^CESM")}, False),
+    ({"gcm": ["CESM2", regex_("CM[0-9]$")], "scenario": "ssp"}, True),
+    ({"var": "pr"}, False),
+])
+def test_match_uses_search_terms(tree, search_terms, expected):
+    dataset = get_datasets("TEST", tree, gcm = "ACCESS-CM2", scenario = "ssp370", org = "BOM", exact_match = True).items[0]
+    assert dataset.match(**search_terms) == expected
+
+
+def test_match_exact(tree):
+    dataset = get_datasets("TEST", tree, gcm = "ACCESS-CM2", scenario = "ssp370", org = "BOM", exact_match = True).items[0]
+    assert not dataset.match(exact_match = True, gcm = "ACCESS")
+    assert dataset.match(exact_match = True, gcm = not_("ACCESS"))
+
+
+@pytest.mark.parametrize("exact_match", [False, True])
+@pytest.mark.parametrize("search_terms", [
+    {"gcm": "access"},
+    {"gcm": "ACCESS"},
+    {"gcm": "ACCESS-CM2"},
+    {"gcm": ["CESM2", "ACCESS-CM2"], "org": "BOM"},
+    {"gcm": not_("cesm2")},
+    {"scenario": glob_("SSP*")},
+    {"scenario": regex_("^hist")},
+    {"var": "pr"},
+])
+def test_filter_agrees_with_match(tree, exact_match, search_terms):
+    datasets = get_datasets("TEST", tree)
+    expected = [item for item in datasets if item.match(exact_match, **search_terms)]
+    assert datasets.filter(exact_match, **search_terms).items == expected
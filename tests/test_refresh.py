@@ -0,0 +1,72 @@
+import io
+import os
+import contextlib
+
+from conftest import make_files
+from dataset_finder import get_datasets
+
+
+def test_refresh_after_deselect_keeps_deselected_files(tree):
+    datasets = get_datasets("TEST", tree, exact_match = True, var = "pr")
+    datasets.deselect("var")
+    assert datasets.items[0].get_info()["var"] == ["pr", "tas"]
+
+    report = datasets.refresh()
+    assert not report
+    assert report.removed_files == []
+    assert datasets.items[0].get_info()["var"] == ["pr", "tas"]
+
+
+def test_since_after_deselect_keeps_deselected_files(tree):
+    earlier = get_datasets("TEST", tree, exact_match = True, var = "pr")
+    earlier.deselect("var")
+
+    later = get_datasets("TEST", tree, exact_match = True, since = earlier, var = "pr")
+    assert later.changes.removed_files == []
+    assert later.changes.added_files == []
+
+
+def describe(collection):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [(item.data, item.roots, sorted(file for info, file in item.get_generated_info(True)), item.get_files()) for item in collection]
+
+
+def change_tree(tree):
+    # a newer version of pr for one dataset, a new dataset, and a file of the latest version removed from another
+    data = os.path.join(os.path.dirname(tree), "data")
+    added = [f"BOM/CESM2/ssp370/pr/v20240301/pr_CESM2_ssp370_{year}0101-{year}1231.nc" for year in [2000, 2001]]
+    new_dataset = ["BOM/CESM2/ssp585/pr/v20240101/pr_CESM2_ssp585_20000101-20001231.nc"]
+    make_files(data, added + new_dataset)
+    removed = "BOM/ACCESS-CM2/historical/tas/v20240201/tas_ACCESS-CM2_historical_20000101-20001231.nc"
+    os.remove(os.path.join(data, removed))
+
+    superseded = {(os.path.join(data, path.replace("v20240301", "v20240201")), os.path.join(data, path)) for path in added}
+    return [os.path.join(data, path) for path in added], os.path.join(data, removed), superseded
+
+
+def test_refresh_reports_changes(tree):
+    datasets = get_datasets("TEST", tree)
+    added_files, removed_file, superseded = change_tree(tree)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = datasets.refresh()
+    assert [item.data for item in report.added] == [{"org": "BOM", "gcm": "CESM2", "scenario": "ssp585"}]
+    assert report.removed == []
+    assert sorted(report.added_files) == added_files
+    assert report.removed_files == [removed_file]
+    assert set(report.superseded) == superseded
+    # the refreshed collection is the same as searching again
+    assert describe(datasets) == describe(get_datasets("TEST", tree))
+
+
+def test_since_reports_the_same_changes(tree):
+    earlier = get_datasets("TEST", tree, exact_match = True, var = "pr")
+    added_files, removed_file, superseded = change_tree(tree)
+
+    later = get_datasets("TEST", tree, exact_match = True, since = earlier, var = "pr")
+    assert [item.data for item in later.changes.added] == [{"org": "BOM", "gcm": "CESM2", "scenario": "ssp585"}]
+    assert sorted(later.changes.added_files) == added_files
+    # the removed file isn't in the selection
+    assert later.changes.removed_files == []
+    assert set(later.changes.superseded) == superseded
+    assert describe(later) == describe(get_datasets("TEST", tree, exact_match = True, var = "pr"))
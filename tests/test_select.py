@@ -0,0 +1,29 @@
+import os
+
+from dataset_finder import get_datasets
+
+
+def variables(dataset):
+    return sorted({os.path.basename(file).split("_")[0] for file in dataset.get_files()})
+
+
+def test_select_list_changed_in_place(tree):
+    dataset = get_datasets("TEST", tree, exact_match = True, gcm = "CESM2", scenario = "ssp370", org = "BOM").items[0]
+    terms = ["pr"]
+    dataset.select(var = terms)
+    assert variables(dataset) == ["pr"]
+
+    terms.append("tas")
+    dataset.select(var = terms)
+    assert variables(dataset) == ["pr", "tas"]
+
+
+def test_select_search_term_list_changed_in_place(tree):
+    terms = ["pr"]
+    dataset = get_datasets("TEST", tree, exact_match = True, gcm = "CESM2", scenario = "ssp370", org = "BOM", var = terms).items[0]
+    assert variables(dataset) == ["pr"]
+
+    # the walk was limited to "pr", so the files of "tas" have to be found again
+    terms.append("tas")
+    dataset.select(var = terms)
+    assert variables(dataset) == ["pr", "tas"]
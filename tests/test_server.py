@@ -0,0 +1,41 @@
+import json
+import time
+
+import dataset_finder
+from dataset_finder import dataset_server, get_datasets, regex_, glob_, not_, _ask_server
+
+
+def test_close_stops_a_scan(tree, tmp_path, monkeypatch):
+    list_dir = dataset_finder._list_dir
+
+    def slow_list_dir(path, dirs_only = False):
+        time.sleep(0.05)
+        return list_dir(path, dirs_only)
+
+    monkeypatch.setattr(dataset_finder, "_list_dir", slow_list_dir)
+    server = dataset_server(str(tmp_path / "server.sock"), tree, keys = ["TEST"], cache = False, threads = 1)
+    time.sleep(0.2)
+    start = time.perf_counter()
+    server.close()
+    assert time.perf_counter() - start < 0.5
+    # an unfinished scan isn't kept
+    assert "TEST" not in server.datasets
+
+
+def test_long_patterns_are_searched_by_the_client(tree, tmp_path):
+    socket_path = str(tmp_path / "server.sock")
+    with dataset_server(socket_path, tree, cache = False, threads = 1) as server:
+        server.start()
+        server.scan("TEST")
+        entry = json.loads(json.dumps(server.session.entry("TEST")))
+
+        def ask(search_terms):
+            return _ask_server(socket_path, {"command": "get_datasets", "key": "TEST", "entry": entry, "search_terms": search_terms})
+
+        short = regex_("^CESM")
+        assert len(ask({"gcm": short})["datasets"]) == 4
+        long = [regex_("(C|" * 60 + "x" + ")*" * 60), not_(glob_("?" * 100))]
+        assert ask({"gcm": long})["error"] == "pattern_too_long"
+        # the client searches directly instead, and the server still answers others
+        assert get_datasets("TEST", tree, server = socket_path, gcm = long).get_files() == get_datasets("TEST", tree, server = False, gcm = long).get_files()
+        assert len(ask({"gcm": short})["datasets"]) == 4
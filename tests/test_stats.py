@@ -0,0 +1,36 @@
+import inspect
+
+import pytest
+
+from dataset_finder import get_datasets, directory_cache, filter_all, iter_filter_all, iter_datasets, paths, finder
+
+
+def counts(stats):
+    # timings depend on the run, everything else should be the same
+    return {name: value for name, value in stats.to_dict().items() if name != "timings"}
+
+
+@pytest.mark.parametrize("search_terms", [{}, {"org": "BOM"}, {"org": "BOM", "var": "pr"}, {"gcm": "CESM2"}])
+@pytest.mark.parametrize("cached", [False, True])
+def test_stats_are_the_same_with_workers(tree, tmp_path, search_terms, cached):
+    def search(name, **kwargs):
+        cache = directory_cache(str(tmp_path / f"{name}.sqlite")) if cached else None
+        return get_datasets("TEST", tree, cache = cache, stats = True, **kwargs, **search_terms).stats
+
+    single = search("single")
+    sharded = search("sharded", workers = 2)
+    assert counts(sharded) == counts(single)
+    if "org" in search_terms:
+        assert single.pruned["{org}"] == 1
+
+
+def test_stats_default_is_the_same_everywhere():
+    functions = [filter_all, iter_filter_all, get_datasets, iter_datasets, paths, finder]
+    assert {inspect.signature(function).parameters["stats"].default for function in functions} == {False}
+
+
+def test_iter_datasets_stats(tree):
+    datasets = list(iter_datasets("TEST", tree, stats = True))
+    assert datasets and all(dataset.stats is datasets[0].stats for dataset in datasets)
+    assert datasets[0].stats.files_found == 64
+    assert all(dataset.stats is None for dataset in iter_datasets("TEST", tree))
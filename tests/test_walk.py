@@ -0,0 +1,27 @@
+import os
+
+from dataset_finder import _walk, _list_dir, directory_cache, get_datasets
+from conftest import make_files, write_paths
+
+
+def test_fixed_levels_are_listed_with_the_lister(tmp_path):
+    make_files(tmp_path, ["a/fixed/x/", "a/other/y/", "b/other/z/"])
+    listed = []
+
+    def lister(path, dirs_only = False):
+        listed.append(os.path.relpath(path, tmp_path))
+        return _list_dir(path, dirs_only)
+
+    assert list(_walk(str(tmp_path) + os.sep, ["{first}", "fixed", "{second}"], lister)) == [os.path.join("a", "fixed", "x")]
+    assert sorted(listed) == sorted([".", "a", "b", os.path.join("a", "fixed")])
+
+
+def test_fixed_levels_are_cached_and_counted(tmp_path):
+    make_files(tmp_path, [f"data/{gcm}/fixed/pr_{year}.nc" for gcm in ["ACCESS-CM2", "CESM2"] for year in [2000, 2001]])
+    yaml_path = write_paths(tmp_path, "TEST", str(tmp_path / "data") + "/{gcm}/fixed/", "/pr_{year}.nc")
+
+    cache = directory_cache()
+    datasets = get_datasets("TEST", yaml_path, cache = cache, stats = True)
+    assert len(datasets.get_files()) == 4
+    # data, each gcm, and each fixed directory
+    assert datasets.stats.dirs_listed == cache.hits + cache.misses == 5
@@ -0,0 +1,37 @@
+import io
+import contextlib
+import concurrent.futures
+
+import pytest
+
+from dataset_finder import get_datasets, iter_datasets
+
+
+def describe(collection):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [(item.data, item.roots, sorted(file for info, file in item.get_generated_info(True)), item.get_files()) for item in collection]
+
+
+SEARCHES = [{}, {"org": "BOM"}, {"gcm": "CESM2", "var": "pr"}, {"scenario": "ssp585"}, {"year": (2002, 2002)}, {"org": "nothing"}]
+
+
+@pytest.mark.parametrize("search_terms", SEARCHES)
+def test_workers_give_the_same_datasets(two_roots, search_terms):
+    expected = describe(get_datasets("TEST", two_roots, **search_terms))
+    assert describe(get_datasets("TEST", two_roots, workers = 2, **search_terms)) == expected
+
+
+@pytest.mark.parametrize("executor_class", [concurrent.futures.ThreadPoolExecutor, concurrent.futures.ProcessPoolExecutor])
+@pytest.mark.parametrize("search_terms", SEARCHES[:3])
+def test_executor_gives_the_same_datasets(two_roots, executor_class, search_terms):
+    expected = describe(get_datasets("TEST", two_roots, **search_terms))
+    with executor_class(2) as executor:
+        assert describe(get_datasets("TEST", two_roots, executor = executor, **search_terms)) == expected
+        # the executor is left for the caller to shut down
+        assert executor.submit(int, "1").result() == 1
+
+
+def test_workers_without_merging_roots(two_roots, tmp_path):
+    cache = str(tmp_path / "cache.sqlite")
+    expected = describe(iter_datasets("TEST", two_roots, merge_roots = False))
+    assert describe(iter_datasets("TEST", two_roots, merge_roots = False, workers = 2, cache = cache)) == expected
@@ -0,0 +1,48 @@
+import io
+import contextlib
+
+import pytest
+
+from dataset_finder import get_datasets, year_range, year_interval, not_, glob_, regex_
+from conftest import make_files, write_paths
+
+
+def test_year_range_is_a_list():
+    assert year_range(2000, 2002) == ["2000", "2001", "2002"]
+    assert year_range(2000, 2001) + year_range(2005, 2005) == ["2000", "2001", "2005"]
+    assert year_range(2000, 2003, inclusive = False)[-1] == "2002"
+    assert year_range(2000, 2004, step = 2) == ["2000", "2002", "2004"]
+
+
+def test_year_range_selects_like_intervals(tree):
+    def files(year):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return get_datasets("TEST", tree, year = year).get_files()
+
+    assert files(year_range(2001, 2003)) == files((2001, 2003)) == files(year_interval(2001, 2003))
+    assert files(year_range(2001, 2001) + year_range(2000, 2000)) == files((2000, 2001))
+    assert len(files(year_range(2001, 2003))) == len(files((2000, 2001))) // 2
+
+
+@pytest.mark.parametrize("year", [not_("2000"), glob_("200*"), ["2000", regex_("1$")]])
+def test_search_terms_on_years_raise(tree, year):
+    with pytest.raises(ValueError, match = "year"):
+        get_datasets("TEST", tree, year = year)
+    with pytest.raises(ValueError, match = "year"):
+        get_datasets("TEST", tree, workers = 2, year = year)
+
+    datasets = get_datasets("TEST", tree)
+    with pytest.raises(ValueError, match = "year"):
+        datasets.select(year = year)
+    with pytest.raises(ValueError, match = "year"):
+        datasets.items[0].select(year = year).get_files()
+
+
+def test_range_end_without_start_is_not_checked(tmp_path):
+    make_files(tmp_path, [f"data/{gcm}/pr_{year}.nc" for gcm in ["ACCESS-CM2", "CESM2"] for year in [2000, 2001]])
+    yaml_path = write_paths(tmp_path, "TEST", str(tmp_path / "data") + "/{gcm}/", "/pr_{year!end}.nc")
+
+    every = get_datasets("TEST", yaml_path)
+    assert len(every.get_files()) == 4
+    assert every.items[0].get_info() == {}
+    assert get_datasets("TEST", yaml_path, year = 2000).get_files() == every.get_files()